@@ -1,5 +1,20 @@
 from django.contrib import admin
-from .models import ImageEdit
+from .models import ImageEdit, ImageRendition, EffectJob
 
 # Register models in the Django admin interface
 admin.site.register(ImageEdit)
+
+
+@admin.register(ImageRendition)
+class ImageRenditionAdmin(admin.ModelAdmin):
+    list_display = ('image_edit', 'width', 'height', 'format', 'created_at')
+    list_filter = ('format', 'width')
+
+
+@admin.register(EffectJob)
+class EffectJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'effect', 'status', 'progress', 'attempts', 'worker', 'created_at',
+                    'finished_at')
+    list_filter = ('status', 'kind')
+    # Image bytes are too big to show
+    exclude = ('input_data', 'result_data')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EditorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'editor'
+
+    def ready(self):
+        # Build the slider lookup tables once per process, not on first use
+        from .effects import precompute_curves
+        precompute_curves()
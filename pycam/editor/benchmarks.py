@@ -0,0 +1,161 @@
+"""
+Helpers for timing image effects on synthetic photos
+"""
+import math
+import time
+import tracemalloc
+
+from PIL import Image, ImageOps
+
+
+def make_test_image(megapixels, mode='RGB'):
+    """Build a deterministic 4:3 test photo of roughly the given size."""
+    width = max(1, int(math.sqrt(megapixels * 1_000_000 * 4 / 3)))
+    height = max(1, int(width * 3 / 4))
+    size = (width, height)
+
+    # Mix noise and gradients so every channel has real tonal range
+    red = Image.effect_noise(size, 64)
+    green = Image.linear_gradient('L').resize(size)
+    blue = Image.radial_gradient('L').resize(size)
+    image = Image.merge('RGB', (red, green, blue))
+
+    if mode == 'P':
+        return image.quantize(colors=256)
+    return image.convert(mode)
+
+
+def time_call(func, *args, repeat=3, **kwargs):
+    """Return the best wall time in seconds over `repeat` runs."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def legacy_apply_sepia(image):
+    """Original per-pixel sepia, kept as the reference for benchmarks."""
+    gray_image = ImageOps.grayscale(image)
+    sepia_image = Image.new('RGB', gray_image.size)
+
+    for x in range(gray_image.width):
+        for y in range(gray_image.height):
+            gray_pixel = gray_image.getpixel((x, y))
+            r = min(int(gray_pixel * 1.07), 255)
+            g = min(int(gray_pixel * 0.74), 255)
+            b = min(int(gray_pixel * 0.43), 255)
+            sepia_image.putpixel((x, y), (r, g, b))
+
+    return sepia_image
+
+
+# Seconds per megapixel an effect may take before the suite fails,
+# regardless of the baseline
+TIME_BUDGETS = {
+    'cartoon': 0.5,
+}
+
+
+# Pillow allocates image memory in blocks; a small block size during the
+# memory pass makes the block count a close measure of bytes allocated
+MEMORY_BLOCK_SIZE = 64 * 1024
+
+
+def measure_effect(image, effect_name, repeat=3, **params):
+    """Measure one effect on one image.
+
+    Returns a dict with the best wall time in seconds, the peak memory in
+    bytes (peak Python/NumPy heap from tracemalloc plus the image buffers
+    Pillow allocated, which tracemalloc can't see) and the number of image
+    buffers Pillow created.
+    """
+    from .effects import apply_effect
+
+    wall_time = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        apply_effect(image, effect_name, tiled=False, **params)
+        elapsed = time.perf_counter() - start
+        wall_time = elapsed if wall_time is None else min(wall_time, elapsed)
+
+    # Separate pass for memory so tracing doesn't skew the timings
+    block_size = Image.core.get_block_size()
+    Image.core.set_block_size(MEMORY_BLOCK_SIZE)
+    try:
+        pillow_before = Image.core.get_stats()
+        tracemalloc.start()
+        apply_effect(image, effect_name, tiled=False, **params)
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pillow_after = Image.core.get_stats()
+    finally:
+        Image.core.set_block_size(block_size)
+
+    pillow_blocks = pillow_after['allocated_blocks'] - pillow_before['allocated_blocks']
+    return {
+        'wall_time': wall_time,
+        'peak_memory': python_peak + pillow_blocks * MEMORY_BLOCK_SIZE,
+        'allocations': pillow_after['new_count'] - pillow_before['new_count'],
+    }
+
+
+def run_benchmarks(effects, sizes, modes, repeat=3, log=None):
+    """Measure every effect at every size and mode.
+
+    Returns a dict keyed by 'effect/mode/megapixels'. Cases that raise are
+    recorded with an 'error' instead of measurements.
+    """
+    results = {}
+    for megapixels in sizes:
+        for mode in modes:
+            image = make_test_image(megapixels, mode)
+            image.load()
+            for effect_name in effects:
+                key = f'{effect_name}/{mode}/{megapixels:g}'
+                try:
+                    result = measure_effect(image, effect_name, repeat=repeat)
+                    result['megapixels'] = image.width * image.height / 1_000_000
+                except Exception as e:
+                    result = {'error': f'{type(e).__name__}: {e}'}
+                results[key] = result
+                if log:
+                    log(key, result)
+    return results
+
+
+def find_regressions(results, baseline, threshold=20.0, min_delta=0.005):
+    """Compare results against a baseline and return a list of problems.
+
+    A case regresses when its wall time or peak memory grows by more than
+    `threshold` percent. Timings that moved by less than `min_delta`
+    seconds are ignored as noise. Effects with a TIME_BUDGETS entry also
+    fail when they exceed their seconds-per-megapixel budget.
+    """
+    problems = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if 'error' in result:
+            if previous and 'error' not in previous:
+                problems.append(f'{key}: now fails with {result["error"]}')
+            continue
+
+        effect_name = key.split('/')[0]
+        budget = TIME_BUDGETS.get(effect_name)
+        if budget is not None and result['wall_time'] > budget * result['megapixels']:
+            problems.append(
+                f'{key}: {result["wall_time"]:.3f}s is over the budget of {budget:g}s per megapixel')
+
+        if not previous or 'error' in previous:
+            continue
+        limit = 1 + threshold / 100
+        if (result['wall_time'] > previous['wall_time'] * limit
+                and result['wall_time'] - previous['wall_time'] > min_delta):
+            problems.append(
+                f'{key}: wall time {previous["wall_time"]:.4f}s -> {result["wall_time"]:.4f}s')
+        if result['peak_memory'] > previous['peak_memory'] * limit:
+            problems.append(
+                f'{key}: peak memory {previous["peak_memory"]} -> {result["peak_memory"]} bytes')
+    return problems
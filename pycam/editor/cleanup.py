@@ -0,0 +1,95 @@
+"""
+Background queue for file cleanup that runs after the transaction commits
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for pending cleanup when the process exits
+SHUTDOWN_TIMEOUT = 10
+
+_tasks = queue.Queue()
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def in_background():
+    """Whether cleanup runs on a background thread (FILE_CLEANUP_IN_BACKGROUND).
+
+    Turn it off to run cleanup in the request once the transaction commits.
+    """
+    return getattr(settings, 'FILE_CLEANUP_IN_BACKGROUND', True)
+
+
+def defer(func, *args):
+    """Run func(*args) in the background once the current transaction commits.
+
+    Nothing runs if the transaction rolls back, so files are never removed
+    for rows that still exist. Outside a transaction it's queued right away.
+    """
+    transaction.on_commit(lambda: _submit(func, args))
+
+
+def _submit(func, args):
+    if not in_background():
+        _run(func, args)
+        return
+    _ensure_thread()
+    _tasks.put((func, args))
+
+
+def _ensure_thread():
+    global _thread
+    with _thread_lock:
+        # Forked web workers don't inherit the parent's thread
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_work, name='file-cleanup', daemon=True)
+            _thread.start()
+
+
+def _work():
+    while True:
+        func, args = _tasks.get()
+        try:
+            close_old_connections()
+            _run(func, args)
+        finally:
+            _tasks.task_done()
+            # The thread may sleep for a long time, don't hold a connection
+            connection.close()
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception as e:
+        # Leftover files waste space but nothing breaks; keep going
+        logger.error(f"File cleanup {func.__qualname__} failed: {str(e)}")
+
+
+def wait(timeout=None):
+    """Block until the queued cleanup is done, or `timeout` seconds pass.
+
+    Returns:
+        Whether the queue was drained
+    """
+    done = threading.Event()
+
+    def join():
+        _tasks.join()
+        done.set()
+
+    threading.Thread(target=join, daemon=True).start()
+    return done.wait(timeout)
+
+
+@atexit.register
+def _drain_on_exit():
+    if _thread is not None and _thread.is_alive() and not wait(SHUTDOWN_TIMEOUT):
+        logger.warning("Exiting with file cleanup still queued")
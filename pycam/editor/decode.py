@@ -0,0 +1,114 @@
+"""
+Decoding of uploaded images for the effect engine
+"""
+import io
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+# Every effect receives images in this mode
+WORKING_MODE = 'RGB'
+
+# Transparent areas are flattened onto this color
+BACKGROUND_COLOR = (255, 255, 255)
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image has more pixels than the decode budget allows."""
+
+
+def get_max_pixels():
+    """Largest image, in pixels, the editor will decode (EFFECT_MAX_PIXELS)."""
+    return getattr(settings, 'EFFECT_MAX_PIXELS', 50_000_000)
+
+
+def decode_image(data, max_edge=None, max_pixels=None):
+    """Decode uploaded image bytes into an upright RGB working image.
+
+    Only the header is read before the size check, so oversized images are
+    rejected before any pixel data is decoded. Camera rotation from EXIF is
+    applied, and every mode (P, RGBA, CMYK, LA, 16-bit, ...) is converted to
+    RGB once here, so effects can rely on a single input mode.
+
+    Args:
+        data: Encoded image bytes
+        max_edge: If set, the longest edge of the returned image is at most
+            this many pixels. JPEGs are decoded straight at a reduced scale
+            instead of decoding the full image and shrinking it.
+        max_pixels: Pixel budget, defaults to EFFECT_MAX_PIXELS
+
+    Returns:
+        PIL Image object in WORKING_MODE
+
+    Raises:
+        ImageTooLargeError: If the image is over the pixel budget
+    """
+    img = read_header(data, max_pixels)
+
+    if max_edge and max(img.size) > max_edge:
+        # JPEG decoders can skip to 1/2, 1/4 or 1/8 scale while decoding;
+        # draft keeps the result at least as large as requested
+        img.draft(WORKING_MODE, (max_edge, max_edge))
+        # thumbnail reduces by whole factors first, then resamples
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    # Phone photos are stored sideways with an orientation tag
+    img = ImageOps.exif_transpose(img)
+    return to_working_mode(img)
+
+
+def read_header(data, max_pixels=None):
+    """Open image bytes without decoding them and enforce the pixel budget.
+
+    Returns:
+        PIL Image object whose pixel data has not been loaded yet
+
+    Raises:
+        ImageTooLargeError: If the image is over the pixel budget
+        PIL.UnidentifiedImageError: If the bytes are not a supported image
+    """
+    max_pixels = max_pixels or get_max_pixels()
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+
+    width, height = img.size
+    if width * height > max_pixels:
+        raise ImageTooLargeError(
+            f'Image is {width}x{height} ({width * height / 1_000_000:.1f} MP); '
+            f'the limit is {max_pixels / 1_000_000:.1f} MP')
+    return img
+
+
+def to_working_mode(img):
+    """Convert an image of any mode to WORKING_MODE."""
+    if img.mode == WORKING_MODE:
+        return img
+
+    if img.mode in ('I', 'I;16', 'I;16L', 'I;16B', 'I;16N', 'F'):
+        # 16-bit and float data would be clipped by a plain conversion
+        img = _to_8bit(img)
+
+    if img.mode == 'P' and 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La'):
+        rgba = img.convert('RGBA')
+        flat = Image.new(WORKING_MODE, img.size, BACKGROUND_COLOR)
+        flat.paste(rgba, mask=rgba.getchannel('A'))
+        return flat
+
+    return img.convert(WORKING_MODE)
+
+
+def _to_8bit(img):
+    """Scale a 16-bit or float grayscale image down to 8-bit 'L'."""
+    if img.mode == 'F':
+        low, high = img.getextrema()
+        scale = 255 / high if high > 1 else 255
+        return img.point(lambda value: value * scale).convert('L')
+
+    img = img.convert('I')
+    if img.getextrema()[1] > 255:
+        img = img.point(lambda value: value * (1 / 256))
+    return img.convert('L')
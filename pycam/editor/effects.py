@@ -1,42 +1,318 @@
-from PIL import Image, ImageFilter, ImageEnhance, ImageOps
+import functools
 
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps
 
-def apply_effect(image, effect_name):
+from . import tiling
+from .lru import LRUCache
+
+
+def apply_effect(image, effect_name, tiled=None, **params):
     """Apply selected effect to image.
 
     Args:
         image: PIL Image object
         effect_name: String with effect name
+        tiled: Split the image into strips processed on the process pool.
+            None decides by image size, False always runs in one piece.
+            Effects that need the whole image are never tiled.
+        **params: Optional effect parameters (e.g. factor, radius)
 
     Returns:
         PIL Image with effect applied
     """
-    effect_functions = {
-        'grayscale': apply_grayscale,
-        'sepia': apply_sepia,
-        'blur': apply_blur,
-        'sharpen': apply_sharpen,
-        'contour': apply_contour,
-        'edge_enhance': apply_edge_enhance,
-        'brightness': apply_brightness,
-        'contrast': apply_contrast,
-        'invert': apply_invert,
-        'solarize': apply_solarize,
-        'emboss': apply_emboss,
-        'posterize': apply_posterize,
-        'cartoon': apply_cartoon,
-        'vignette': apply_vignette,
-        'vintage': apply_vintage,
-        'cool': apply_cool,
-        'warm': apply_warm,
-        'original': lambda img: img,
-    }
-
-    if effect_name not in effect_functions:
+    if effect_name not in EFFECTS:
         return image
 
+    if tiled is None:
+        tiled = tiling.should_tile(image, effect_name, params)
+    if tiled and tiling.tile_overlap(effect_name, params) is not None:
+        return tiling.apply_tiled(image, effect_name, params)
+
     # Return image with applied effect
-    return effect_functions[effect_name](image)
+    return EFFECTS[effect_name](image, **params)
+
+
+class EffectParameterError(ValueError):
+    """Raised when an effect parameter is unknown or outside its range."""
+
+
+# Accepted (min, max) range of every tunable effect parameter
+EFFECT_PARAMETERS = {
+    'blur': {'radius': (0.0, 20.0)},
+    'brightness': {'factor': (0.0, 3.0)},
+    'cartoon': {'colors': (2, 64)},
+    'contrast': {'factor': (0.0, 3.0)},
+    'posterize': {'bits': (1, 8)},
+    'solarize': {'threshold': (0, 256)},
+    'vignette': {'level': (0.0, 1.0)},
+}
+
+# How the 0-100 intensity slider maps onto each effect's main parameter:
+# (parameter, value at 0, value at 100). Intensity 50 gives the default.
+INTENSITY_SCALES = {
+    'blur': ('radius', 0.0, 4.0),
+    'brightness': ('factor', 0.5, 2.5),
+    'contrast': ('factor', 0.5, 2.5),
+    'posterize': ('bits', 3, 1),
+    'solarize': ('threshold', 256, 0),
+    'vignette': ('level', 0.0, 0.6),
+}
+
+# Intensity is snapped to this step so slider positions share cached tables
+INTENSITY_STEP = 5
+
+
+def intensity_to_params(effect_name, intensity):
+    """Map a 0-100 slider intensity onto the effect's parameters."""
+    if effect_name not in INTENSITY_SCALES:
+        return {}
+
+    try:
+        intensity = float(intensity)
+    except (TypeError, ValueError):
+        raise EffectParameterError(f'Invalid intensity: {intensity!r}')
+    if not 0 <= intensity <= 100:
+        raise EffectParameterError(f'Intensity must be between 0 and 100, got {intensity:g}')
+
+    name, start, end = INTENSITY_SCALES[effect_name]
+    step = round(intensity / INTENSITY_STEP) * INTENSITY_STEP
+    value = start + (end - start) * step / 100
+    if isinstance(start, int):
+        value = int(round(value))
+    else:
+        value = round(value, 4)
+    return {name: value}
+
+
+def resolve_params(effect_name, params=None, intensity=None):
+    """Return validated parameters for an effect.
+
+    Explicit params win over the ones derived from the intensity slider.
+
+    Raises:
+        EffectParameterError: If a parameter is unknown or out of range
+    """
+    resolved = intensity_to_params(effect_name, intensity) if intensity not in (None, '') else {}
+    ranges = EFFECT_PARAMETERS.get(effect_name, {})
+
+    for name, value in (params or {}).items():
+        if name not in ranges:
+            raise EffectParameterError(f'Unknown parameter {name!r} for effect {effect_name!r}')
+        low, high = ranges[name]
+        try:
+            value = type(low)(value)
+        except (TypeError, ValueError):
+            raise EffectParameterError(f'Invalid value for {name}: {value!r}')
+        if not low <= value <= high:
+            raise EffectParameterError(f'{name} must be between {low} and {high}, got {value}')
+        resolved[name] = value
+
+    return resolved
+
+
+def apply_pipeline(image, steps, checkpoint=None):
+    """Apply an ordered list of effects to image.
+
+    Consecutive point operations (brightness, contrast, invert, warm, ...)
+    are folded into one set of per-channel tone curves and applied with a
+    single Image.point call, so a chain of them costs about one pass.
+    Other effects (blur, sharpen, emboss, ...) run as separate stages.
+
+    Args:
+        image: PIL Image object
+        steps: List of effect names, (name, params) pairs or
+            dicts like {'effect': 'contrast', 'factor': 1.2}
+        checkpoint: Optional callable run before each separate stage; it
+            can raise to abandon a render that is no longer wanted
+
+    Returns:
+        PIL Image with all effects applied
+    """
+    curves = None
+    tones = None
+
+    for effect_name, params in (parse_step(step) for step in steps):
+        if effect_name in POINT_EFFECTS:
+            if curves is None:
+                image = _as_rgb(image)
+                tones = ToneStats(image)
+                curves = IDENTITY_CURVES
+            # Curves are built against the tones of the image so far
+            step_curves = POINT_EFFECTS[effect_name](tones.through(curves), **params)
+            curves = compose_curves(curves, step_curves)
+        elif effect_name in EFFECTS:
+            if curves is not None:
+                image = apply_curves(image, curves)
+                curves = None
+            if checkpoint:
+                checkpoint()
+            image = apply_effect(image, effect_name, **params)
+
+    if curves is not None:
+        image = apply_curves(image, curves)
+    return image
+
+
+def parse_step(step):
+    """Normalize a pipeline step into an (effect_name, params) pair."""
+    if isinstance(step, str):
+        return step, {}
+    if isinstance(step, dict):
+        params = dict(step)
+        return params.pop('effect'), params
+    effect_name, params = step
+    return effect_name, dict(params or {})
+
+
+# Point operations work on per-channel tone curves: a (3, 256) uint8 array
+# mapping every input value of R, G and B to its output value
+RAMP = np.arange(256, dtype=np.float32)
+IDENTITY_CURVES = np.tile(np.arange(256, dtype=np.uint8), (3, 1))
+
+
+def compose_curves(first, second):
+    """Return curves equivalent to applying `first` and then `second`."""
+    return np.take_along_axis(second, first.astype(np.intp), axis=1)
+
+
+def apply_curves(image, curves):
+    """Apply per-channel tone curves to image in one Image.point pass."""
+    image = _as_rgb(image)
+    if np.array_equal(curves, IDENTITY_CURVES):
+        return image
+
+    table = curves.ravel().tolist()
+    if image.mode == 'RGBA':
+        # Leave the alpha channel untouched
+        table += list(range(256))
+    return image.point(table)
+
+
+def _as_rgb(image):
+    """Return image in a mode the tone curves can be applied to."""
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    return image.convert('RGB')
+
+
+def _frozen(curve):
+    """Make a cached curve read-only so callers cannot modify the shared copy."""
+    curve.flags.writeable = False
+    return curve
+
+
+# Curves only depend on their parameters, so they are memoized: moving the
+# intensity slider back and forth is a table lookup, not a rebuild
+@functools.lru_cache(maxsize=2048)
+def _blend_curve(degenerate, factor):
+    """Tone curve for Image.blend(degenerate, band, factor), as ImageEnhance uses."""
+    # Same float32 math and truncation as Pillow's C blend
+    degenerate = np.float32(degenerate)
+    values = degenerate + np.float32(factor) * (RAMP - degenerate)
+    return _frozen(np.clip(np.trunc(values), 0, 255).astype(np.uint8))
+
+
+@functools.lru_cache(maxsize=256)
+def _solarize_curve(threshold):
+    """Tone curve for ImageOps.solarize."""
+    ramp = IDENTITY_CURVES[0]
+    return _frozen(np.where(ramp < threshold, ramp, 255 - ramp).astype(np.uint8))
+
+
+@functools.lru_cache(maxsize=8)
+def _posterize_curve(bits):
+    """Tone curve for ImageOps.posterize."""
+    mask = ~(2 ** (8 - bits) - 1) & 0xFF
+    return _frozen(IDENTITY_CURVES[0] & np.uint8(mask))
+
+
+class ToneStats:
+    """
+    Channel statistics for an image seen through tone curves.
+    The histogram is computed once per image, and only if an effect needs a mean.
+    """
+
+    def __init__(self, image, curves=None, parent=None):
+        self.image = image
+        self.curves = IDENTITY_CURVES if curves is None else curves
+        self._parent = parent
+        self._histogram = None
+
+    @property
+    def histogram(self):
+        if self._parent is not None:
+            return self._parent.histogram
+        if self._histogram is None:
+            self._histogram = np.array(self.image.histogram()[:768], dtype=np.float64).reshape(3, 256)
+        return self._histogram
+
+    def through(self, curves):
+        """Return stats for the image after `curves` have been applied."""
+        return ToneStats(self.image, curves, parent=self._parent or self)
+
+    def band_means(self):
+        """Return the mean of R, G and B after the curves."""
+        histogram = self.histogram
+        counts = histogram.sum(axis=1)
+        return (histogram * self.curves).sum(axis=1) / np.maximum(counts, 1)
+
+    def gray_mean(self):
+        """Return the mean luminance after the curves, as ImageEnhance.Contrast computes it."""
+        r, g, b = self.band_means()
+        return int(r * 0.299 + g * 0.587 + b * 0.114 + 0.5)
+
+
+def brightness_curves(tones, factor=1.5):
+    """Curves for ImageEnhance.Brightness."""
+    return np.tile(_blend_curve(0, factor), (3, 1))
+
+
+def contrast_curves(tones, factor=1.5):
+    """Curves for ImageEnhance.Contrast around the mean luminance."""
+    return np.tile(_blend_curve(tones.gray_mean(), factor), (3, 1))
+
+
+def invert_curves(tones):
+    """Curves for ImageOps.invert."""
+    return 255 - IDENTITY_CURVES
+
+
+def solarize_curves(tones, threshold=128):
+    """Curves for ImageOps.solarize."""
+    return np.tile(_solarize_curve(threshold), (3, 1))
+
+
+def posterize_curves(tones, bits=2):
+    """Curves for ImageOps.posterize."""
+    return np.tile(_posterize_curve(bits), (3, 1))
+
+
+def vintage_curves(tones):
+    """Curves for the vintage look: per-channel contrast then brightness."""
+    curves = []
+    for mean, contrast, brightness in zip(tones.band_means(), (1.1, 0.9, 0.9), (1.1, 0.9, 0.8)):
+        band_contrast = _blend_curve(int(mean + 0.5), contrast)
+        curves.append(_blend_curve(0, brightness)[band_contrast])
+    return np.stack(curves)
+
+
+def cool_curves(tones):
+    """Curves for the cool tone: brighter blue channel."""
+    return np.stack([IDENTITY_CURVES[0], IDENTITY_CURVES[1], _blend_curve(0, 1.2)])
+
+
+def warm_curves(tones):
+    """Curves for the warm tone: brighter red and green channels."""
+    return np.stack([_blend_curve(0, 1.2), _blend_curve(0, 1.1), IDENTITY_CURVES[2]])
+
+
+def _point_effect(curves_function):
+    """Build an apply_* function that runs a single point operation."""
+    def apply(image, **params):
+        image = _as_rgb(image)
+        return apply_curves(image, curves_function(ToneStats(image), **params))
+    return apply
 
 
 def apply_grayscale(image):
@@ -44,20 +320,19 @@ def apply_grayscale(image):
     return ImageOps.grayscale(image).convert('RGB')
 
 
+# Per-channel tone curves for sepia, applied to the grayscale band.
+# Values match the original per-pixel formula: min(int(gray * k), 255)
+SEPIA_LUTS = tuple(
+    [min(int(value * scale), 255) for value in range(256)]
+    for scale in (1.07, 0.74, 0.43)
+)
+
+
 def apply_sepia(image):
     """Apply sepia tone to image."""
     gray_image = ImageOps.grayscale(image)
-    sepia_image = Image.new('RGB', gray_image.size)
-
-    for x in range(gray_image.width):
-        for y in range(gray_image.height):
-            gray_pixel = gray_image.getpixel((x, y))
-            r = min(int(gray_pixel * 1.07), 255)
-            g = min(int(gray_pixel * 0.74), 255)
-            b = min(int(gray_pixel * 0.43), 255)
-            sepia_image.putpixel((x, y), (r, g, b))
-
-    return sepia_image
+    # One lookup table pass per channel instead of a Python loop per pixel
+    return Image.merge('RGB', [gray_image.point(lut) for lut in SEPIA_LUTS])
 
 
 def apply_blur(image, radius=2):
@@ -82,24 +357,22 @@ def apply_edge_enhance(image):
 
 def apply_brightness(image, factor=1.5):
     """Adjust image brightness."""
-    enhancer = ImageEnhance.Brightness(image)
-    return enhancer.enhance(factor)
+    return _point_effect(brightness_curves)(image, factor=factor)
 
 
 def apply_contrast(image, factor=1.5):
     """Adjust image contrast."""
-    enhancer = ImageEnhance.Contrast(image)
-    return enhancer.enhance(factor)
+    return _point_effect(contrast_curves)(image, factor=factor)
 
 
 def apply_invert(image):
     """Invert image colors."""
-    return ImageOps.invert(image)
+    return _point_effect(invert_curves)(image)
 
 
 def apply_solarize(image, threshold=128):
     """Apply solarize effect."""
-    return ImageOps.solarize(image, threshold=threshold)
+    return _point_effect(solarize_curves)(image, threshold=threshold)
 
 
 def apply_emboss(image):
@@ -109,66 +382,129 @@ def apply_emboss(image):
 
 def apply_posterize(image, bits=2):
     """Apply posterize effect."""
-    return ImageOps.posterize(image, bits)
+    return _point_effect(posterize_curves)(image, bits=bits)
+
+
+# Cartoon settings: palette size, the long edge of the copy the palette is
+# picked from, and the edge strength above which a pixel is inked black
+CARTOON_COLORS = 8
+CARTOON_PALETTE_EDGE = 128
+CARTOON_EDGE_THRESHOLD = 40
+
+
+def apply_cartoon(image, colors=CARTOON_COLORS):
+    """Apply cartoon-like effect to image: flat colors with dark outlines."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
 
+    # Smooth away texture so colors come out as flat regions
+    smoothed = image.filter(ImageFilter.SMOOTH_MORE)
 
-def apply_cartoon(image):
-    """Apply cartoon-like effect to image."""
-    # First apply edge detection - not directly used but affects the image
-    # Then apply color quantization
-    cartoon = image.quantize(colors=8).convert('RGB')
-    # Blend edges with quantized image
-    return ImageEnhance.Contrast(cartoon).enhance(1.5)
+    # Edge mask: white on strong edges, black everywhere else
+    edges = ImageOps.grayscale(smoothed).filter(ImageFilter.FIND_EDGES)
+    edge_mask = edges.point(lambda value: 255 if value > CARTOON_EDGE_THRESHOLD else 0)
+
+    # Pick the palette on a small copy, then map the full image onto it
+    sample = smoothed.copy()
+    sample.thumbnail((CARTOON_PALETTE_EDGE, CARTOON_PALETTE_EDGE), Image.Resampling.BILINEAR)
+    palette = sample.quantize(colors=colors, method=Image.Quantize.MEDIANCUT)
+    flat = smoothed.quantize(palette=palette, dither=Image.Dither.NONE).convert('RGB')
+
+    # Ink the outlines over the flat colors in place
+    flat.paste((0, 0, 0), mask=edge_mask)
+    return flat
+
+
+# Vignette masks are reused across previews of the same photo; a 12 MP
+# mask is 12 MB, so the cache is bounded by total bytes as well as entries
+VIGNETTE_MASK_CACHE = LRUCache(max_entries=8, max_bytes=64 * 1024 * 1024,
+                               sizeof=lambda mask: mask.width * mask.height)
+
+
+def get_vignette_mask(width, height, level):
+    """Return the radial 'L' mask for a vignette, cached by (width, height, level)."""
+    key = (width, height, level)
+    mask = VIGNETTE_MASK_CACHE.get(key)
+    if mask is None:
+        mask = _build_vignette_mask(width, height, level)
+        VIGNETTE_MASK_CACHE.set(key, mask)
+    return mask
+
+
+def _build_vignette_mask(width, height, level):
+    """Compute the vignette mask for the whole image in one array operation."""
+    # Distance from center, normalized so the inscribed circle reaches 1.0
+    xs = np.arange(width, dtype=np.float32) - width / 2
+    ys = np.arange(height, dtype=np.float32)[:, np.newaxis] - height / 2
+    distance = np.minimum(1.0, np.hypot(xs, ys) / (min(width, height) / 2))
+    values = (255 * (1 - distance * level)).astype(np.uint8)
+    return Image.fromarray(values)
 
 
 def apply_vignette(image, level=0.3):
     """Apply vignette effect to image."""
-    # Create a radial gradient mask
-    width, height = image.size
-    mask = Image.new('L', (width, height), 255)
-
-    # Draw circle with decreasing brightness from center
-    for y in range(height):
-        for x in range(width):
-            # Calculate distance from center (normalized)
-            distance = ((x - width / 2) ** 2 + (y - height / 2) ** 2) ** 0.5
-            distance = min(1.0, distance / (min(width, height) / 2))
-            # Set value based on distance
-            value = int(255 * (1 - distance * level))
-            mask.putpixel((x, y), value)
-
-    # Apply mask
-    result = image.copy()
-    result.putalpha(mask)
-    # Convert back to RGB
-    return result.convert('RGB')
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    mask = get_vignette_mask(image.width, image.height, level)
+    # Blend towards black where the mask is dark
+    black = Image.new('RGB', image.size, 0)
+    return Image.composite(image, black, mask)
 
 
 def apply_vintage(image):
     """Apply vintage color effect."""
-    # Adjust color channels for a vintage look
-    r, g, b = image.split()
-    r = ImageEnhance.Contrast(r).enhance(1.1)
-    r = ImageEnhance.Brightness(r).enhance(1.1)
-    g = ImageEnhance.Contrast(g).enhance(0.9)
-    g = ImageEnhance.Brightness(g).enhance(0.9)
-    b = ImageEnhance.Contrast(b).enhance(0.9)
-    b = ImageEnhance.Brightness(b).enhance(0.8)
-    return Image.merge('RGB', (r, g, b))
+    return _point_effect(vintage_curves)(image)
 
 
 def apply_cool(image):
     """Apply cool tone effect."""
-    # Enhance blue channel
-    r, g, b = image.split()
-    b = ImageEnhance.Brightness(b).enhance(1.2)
-    return Image.merge('RGB', (r, g, b))
+    return _point_effect(cool_curves)(image)
 
 
 def apply_warm(image):
     """Apply warm tone effect."""
-    # Enhance red and green channels
-    r, g, b = image.split()
-    r = ImageEnhance.Brightness(r).enhance(1.2)
-    g = ImageEnhance.Brightness(g).enhance(1.1)
-    return Image.merge('RGB', (r, g, b))
+    return _point_effect(warm_curves)(image)
+
+
+# Registry of every effect apply_effect can run, by name
+EFFECTS = {
+    'grayscale': apply_grayscale,
+    'sepia': apply_sepia,
+    'blur': apply_blur,
+    'sharpen': apply_sharpen,
+    'contour': apply_contour,
+    'edge_enhance': apply_edge_enhance,
+    'brightness': apply_brightness,
+    'contrast': apply_contrast,
+    'invert': apply_invert,
+    'solarize': apply_solarize,
+    'emboss': apply_emboss,
+    'posterize': apply_posterize,
+    'cartoon': apply_cartoon,
+    'vignette': apply_vignette,
+    'vintage': apply_vintage,
+    'cool': apply_cool,
+    'warm': apply_warm,
+    'original': lambda img, **params: img,
+}
+
+# Effects that are pure per-channel point operations, by name, as curve
+# builders that apply_pipeline can fuse into a single lookup table
+POINT_EFFECTS = {
+    'brightness': brightness_curves,
+    'contrast': contrast_curves,
+    'invert': invert_curves,
+    'solarize': solarize_curves,
+    'posterize': posterize_curves,
+    'vintage': vintage_curves,
+    'cool': cool_curves,
+    'warm': warm_curves,
+}
+
+
+def precompute_curves():
+    """Build the curves for every intensity step of the parametric point effects."""
+    for intensity in range(0, 101, INTENSITY_STEP):
+        for effect_name in ('brightness', 'solarize', 'posterize'):
+            POINT_EFFECTS[effect_name](None, **intensity_to_params(effect_name, intensity))
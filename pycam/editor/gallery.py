@@ -0,0 +1,81 @@
+"""
+Keyset pagination of a user's gallery
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import ImageEdit, ImageRendition
+
+# Largest page a client can ask for
+MAX_PAGE_SIZE = 100
+
+
+def get_page_size():
+    """Number of images on a gallery page (GALLERY_PAGE_SIZE)."""
+    return getattr(settings, 'GALLERY_PAGE_SIZE', 24)
+
+
+def encode_cursor(image_edit):
+    """Return an opaque cursor pointing just after an image."""
+    position = f'{image_edit.created_at.isoformat()}|{image_edit.id}'
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (created_at, id) a cursor points after.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, image_id = position.split('|')
+        created_at = parse_datetime(created_at)
+        image_id = int(image_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if created_at is None:
+        raise ValueError('Invalid cursor')
+    return created_at, image_id
+
+
+def get_gallery_page(user, cursor=None, limit=None):
+    """Return a page of a user's images, newest first.
+
+    Pages are found with a (created_at, id) keyset rather than an offset, so
+    every page costs the same however deep it is, and deletes don't shift
+    later pages. Only the columns the gallery shows are loaded.
+
+    Args:
+        user: Owner of the gallery
+        cursor: Cursor of the previous page, None for the first page
+        limit: Page size, defaults to GALLERY_PAGE_SIZE
+
+    Returns:
+        (list of ImageEdit, cursor of the next page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = min(max(1, limit or get_page_size()), MAX_PAGE_SIZE)
+
+    images = (ImageEdit.objects
+              .filter(user=user)
+              .only('id', 'user_id', 'edited_image', 'effect_applied', 'created_at')
+              .prefetch_related(Prefetch(
+                  'renditions',
+                  queryset=ImageRendition.objects.only('id', 'image_edit_id', 'width', 'format', 'file')))
+              .order_by('-created_at', '-id'))
+    if cursor:
+        created_at, image_id = decode_cursor(cursor)
+        images = images.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=image_id))
+
+    # One extra row says whether there is another page
+    page = list(images[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], encode_cursor(page[limit - 1])
+    return page, None
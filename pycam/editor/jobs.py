@@ -0,0 +1,141 @@
+"""
+Database-backed queue of effect jobs run by separate worker processes
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EffectJob
+from .rendering import render, save_edit
+
+logger = logging.getLogger(__name__)
+
+
+def get_job_timeout():
+    """Seconds after which a running job is assumed lost (EFFECT_JOB_TIMEOUT)."""
+    return getattr(settings, 'EFFECT_JOB_TIMEOUT', 10 * 60)
+
+
+def get_job_retention():
+    """Seconds finished jobs and their results are kept (EFFECT_JOB_RETENTION)."""
+    return getattr(settings, 'EFFECT_JOB_RETENTION', 24 * 60 * 60)
+
+
+def get_max_attempts():
+    """Times a job is started before a job whose workers keep dying fails (EFFECT_JOB_MAX_ATTEMPTS)."""
+    return getattr(settings, 'EFFECT_JOB_MAX_ATTEMPTS', 3)
+
+
+def enqueue_apply(user, image_data, ext, effect_name, params=None, steps=None, max_edge=None):
+    """Queue rendering an effect preview and return the job."""
+    return EffectJob.objects.create(
+        user=user,
+        kind=EffectJob.KIND_APPLY,
+        effect=effect_name,
+        params=params or {},
+        steps=steps,
+        max_edge=max_edge,
+        input_data=image_data,
+        input_format=ext,
+    )
+
+
+def enqueue_save(user, image_data, ext, effect_name, params=None):
+    """Queue rendering an effect at full size and saving it to the gallery."""
+    return EffectJob.objects.create(
+        user=user,
+        kind=EffectJob.KIND_SAVE,
+        effect=effect_name,
+        params=params or {},
+        input_data=image_data,
+        input_format=ext,
+    )
+
+
+def claim_next_job(worker_name):
+    """Take the oldest queued job for this worker, or return None.
+
+    The job is claimed with a conditional update, so when several workers
+    race for the same job exactly one of them gets it. This works the same
+    on SQLite and PostgreSQL without row locks.
+    """
+    while True:
+        job_id = (EffectJob.objects.filter(status=EffectJob.STATUS_QUEUED)
+                  .order_by('created_at').values_list('id', flat=True).first())
+        if job_id is None:
+            return None
+        claimed = EffectJob.objects.filter(id=job_id, status=EffectJob.STATUS_QUEUED).update(
+            status=EffectJob.STATUS_RUNNING, started_at=timezone.now(), worker=worker_name, progress=0,
+            attempts=F('attempts') + 1)
+        if claimed:
+            return EffectJob.objects.get(id=job_id)
+        # Another worker got there first, try the next one
+
+
+def set_progress(job, percent):
+    """Record how far a job has got."""
+    job.progress = percent
+    EffectJob.objects.filter(id=job.id).update(progress=percent)
+
+
+def run_job(job):
+    """Do the work of a claimed job and record the outcome."""
+    def report(percent):
+        set_progress(job, percent)
+
+    try:
+        if job.kind == EffectJob.KIND_APPLY:
+            steps = [tuple(step) for step in job.steps] if job.steps else None
+            result = render(bytes(job.input_data), job.input_format, job.effect, job.params,
+                            steps=steps, max_edge=job.max_edge, progress=report)
+            job.result_data = result['data']
+            job.result_width = result['width']
+            job.result_height = result['height']
+        else:
+            job.image_edit = save_edit(job.user, bytes(job.input_data), job.input_format,
+                                       job.effect, job.params, progress=report)
+        job.status = EffectJob.STATUS_DONE
+        job.progress = 100
+    except Exception as e:
+        logger.error(f"Effect job {job.id} failed: {str(e)}")
+        job.status = EffectJob.STATUS_FAILED
+        job.error = str(e)
+
+    # The input is no longer needed once the job has finished
+    job.input_data = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result_data', 'result_width', 'result_height',
+                            'image_edit', 'error', 'input_data', 'finished_at'])
+    return job
+
+
+def requeue_stale_jobs():
+    """Put running jobs whose worker has died back in the queue.
+
+    A job that has already been started get_max_attempts() times fails
+    instead, so an image that kills its worker (e.g. by running it out of
+    memory) can't take down every worker in turn forever.
+    """
+    now = timezone.now()
+    stale = EffectJob.objects.filter(status=EffectJob.STATUS_RUNNING,
+                                     started_at__lt=now - timedelta(seconds=get_job_timeout()))
+
+    max_attempts = get_max_attempts()
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=EffectJob.STATUS_FAILED, error=f'The job was stopped {max_attempts} times without finishing',
+        input_data=None, finished_at=now)
+    if failed:
+        logger.warning(f"Gave up on {failed} effect jobs after {max_attempts} attempts")
+
+    return stale.update(status=EffectJob.STATUS_QUEUED, started_at=None, worker='', progress=0)
+
+
+def purge_finished_jobs():
+    """Delete finished jobs older than the retention period."""
+    cutoff = timezone.now() - timedelta(seconds=get_job_retention())
+    deleted, _ = EffectJob.objects.filter(
+        status__in=[EffectJob.STATUS_DONE, EffectJob.STATUS_FAILED], finished_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,105 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from editor.benchmarks import run_benchmarks, find_regressions
+from editor.effects import EFFECTS
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every effect across image sizes and modes against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--effects',
+            nargs='+',
+            default=[name for name in EFFECTS if name != 'original'],
+            help='Effects to benchmark (default: all registered effects)',
+        )
+        parser.add_argument(
+            '--sizes',
+            type=float,
+            nargs='+',
+            default=[0.3, 2, 12, 24],
+            help='Image sizes in megapixels',
+        )
+        parser.add_argument(
+            '--modes',
+            nargs='+',
+            default=['RGB', 'RGBA', 'L', 'P'],
+            help='Image modes to feed the effects',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per case; the best wall time is kept',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=getattr(settings, 'EFFECT_BENCHMARK_BASELINE',
+                            os.path.join(settings.PROJECT_DIR, 'benchmarks', 'effects_baseline.json')),
+            help='JSON file with the baseline results',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20.0,
+            help='Percentage an effect may get slower or use more memory before failing',
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Write the results as the new baseline instead of comparing',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['effects']) - set(EFFECTS)
+        if unknown:
+            raise CommandError(f'Unknown effects: {", ".join(sorted(unknown))}')
+
+        results = run_benchmarks(
+            options['effects'], options['sizes'], options['modes'],
+            repeat=options['repeat'], log=self.log_result,
+        )
+
+        baseline_path = options['baseline']
+        if options['update']:
+            # Merge so a partial run only replaces the cases it measured
+            baseline = self.load_baseline(baseline_path)
+            baseline.update(results)
+            os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+            with open(baseline_path, 'w') as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        baseline = self.load_baseline(baseline_path)
+        if not baseline:
+            self.stdout.write(self.style.WARNING(
+                f'No baseline at {baseline_path}; run with --update to record one'))
+
+        problems = find_regressions(results, baseline, threshold=options['threshold'])
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            raise CommandError(f'{len(problems)} effect benchmark(s) regressed')
+        self.stdout.write(self.style.SUCCESS('No effect regressions'))
+
+    def log_result(self, key, result):
+        if 'error' in result:
+            self.stdout.write(self.style.WARNING(f'{key:<28} {result["error"]}'))
+        else:
+            self.stdout.write(
+                f'{key:<28} {result["wall_time"] * 1000:9.1f} ms '
+                f'{result["peak_memory"] / 1_000_000:8.1f} MB '
+                f'{result["allocations"]:4d} allocs'
+            )
+
+    def load_baseline(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from editor.benchmarks import make_test_image, time_call, legacy_apply_sepia
+from editor.effects import apply_sepia
+
+
+class Command(BaseCommand):
+    help = 'Compare the lookup-table sepia against the legacy per-pixel loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=float,
+            nargs='+',
+            default=[1, 4, 12],
+            help='Image sizes to test, in megapixels',
+        )
+        parser.add_argument(
+            '--legacy-sample',
+            type=float,
+            default=0.25,
+            help='Megapixels to time the legacy loop on; its cost is linear so it is '
+                 'scaled up to each size. Use 0 to run the legacy loop at full size.',
+        )
+        parser.add_argument(
+            '--min-speedup',
+            type=float,
+            default=100.0,
+            help='Fail if any size is slower than this many times the legacy speed',
+        )
+
+    def handle(self, *args, **options):
+        sample_mp = options['legacy_sample']
+        min_speedup = options['min_speedup']
+
+        legacy_per_pixel = None
+        if sample_mp > 0:
+            sample = make_test_image(sample_mp)
+            legacy_per_pixel = time_call(legacy_apply_sepia, sample, repeat=1) / (sample.width * sample.height)
+
+        failures = []
+        for megapixels in options['sizes']:
+            image = make_test_image(megapixels)
+            pixels = image.width * image.height
+
+            if legacy_per_pixel is None:
+                legacy_time = time_call(legacy_apply_sepia, image, repeat=1)
+            else:
+                legacy_time = legacy_per_pixel * pixels
+            new_time = time_call(apply_sepia, image)
+            speedup = legacy_time / new_time
+
+            self.stdout.write(
+                f'{megapixels:>5g} MP {image.width}x{image.height}: '
+                f'legacy {legacy_time:.2f}s, lut {new_time * 1000:.1f}ms, {speedup:.0f}x'
+            )
+            if speedup < min_speedup:
+                failures.append(f'{megapixels:g} MP ({speedup:.0f}x)')
+
+        if failures:
+            raise CommandError(f'Sepia speedup below {min_speedup:g}x at: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS(f'Sepia is at least {min_speedup:g}x faster at every size'))
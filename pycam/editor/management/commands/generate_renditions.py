@@ -0,0 +1,39 @@
+"""
+Django command that creates gallery renditions for images saved before they existed.
+"""
+from django.core.management.base import BaseCommand
+
+from editor.models import ImageEdit
+from editor.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Create the missing gallery renditions of saved images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of images to load from the database at a time',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Stop after this many images',
+        )
+
+    def handle(self, *args, **options):
+        images = ImageEdit.objects.filter(renditions__isnull=True).exclude(edited_image='').order_by('id')
+        if options['limit']:
+            images = images[:options['limit']]
+
+        processed = created = 0
+        for image_edit in images.iterator(chunk_size=options['batch_size']):
+            created += len(generate_renditions(image_edit))
+            processed += 1
+            if processed % options['batch_size'] == 0:
+                self.stdout.write(f'{processed} images processed')
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} renditions for {processed} images'))
@@ -0,0 +1,81 @@
+"""
+Django command that processes queued effect jobs.
+"""
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from editor.jobs import claim_next_job, run_job, requeue_stale_jobs, purge_finished_jobs
+
+# Seconds between housekeeping passes (stale and old jobs)
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Run a worker that processes queued apply-effect and save jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.5,
+            help='Seconds to wait before checking again when the queue is empty',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit after processing this many jobs',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs queued now and exit',
+        )
+
+    def handle(self, *args, **options):
+        worker_name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        # Finish the current job before exiting on SIGTERM/SIGINT
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.stdout.write(f'Effect worker {worker_name} started')
+        processed = 0
+        last_housekeeping = 0
+
+        while not self.stopping:
+            # Drop connections the database has closed while we were idle
+            close_old_connections()
+
+            if time.monotonic() - last_housekeeping > HOUSEKEEPING_INTERVAL:
+                requeued = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+                purge_finished_jobs()
+                last_housekeeping = time.monotonic()
+
+            job = claim_next_job(worker_name)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.perf_counter()
+            job = run_job(job)
+            self.stdout.write(
+                f'{job.kind} {job.effect} job {job.id}: {job.status} in {time.perf_counter() - started:.2f}s')
+
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'Effect worker stopped after {processed} jobs'))
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EffectJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('apply', 'Apply effect'), ('save', 'Save image')], max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('effect', models.CharField(max_length=200)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('steps', models.JSONField(blank=True, null=True)),
+                ('max_edge', models.PositiveIntegerField(blank=True, null=True)),
+                ('input_data', models.BinaryField(null=True)),
+                ('input_format', models.CharField(max_length=10)),
+                ('result_data', models.BinaryField(null=True)),
+                ('result_width', models.PositiveIntegerField(blank=True, null=True)),
+                ('result_height', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('image_edit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='editor.imageedit')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effect_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='editor_effe_status_7a0b1c_idx')],
+            },
+        ),
+    ]
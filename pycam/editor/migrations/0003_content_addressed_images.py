@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:00
+
+import editor.models
+import editor.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0002_effectjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imageedit',
+            name='edited_image',
+            field=models.ImageField(blank=True, storage=editor.storage.ContentAddressedStorage(), upload_to=editor.models.get_image_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='imageedit',
+            name='original_image',
+            field=models.ImageField(storage=editor.storage.ContentAddressedStorage(), upload_to=editor.models.get_image_upload_path),
+        ),
+    ]
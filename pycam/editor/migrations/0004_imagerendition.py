@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+import django.db.models.deletion
+import editor.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0003_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('format', models.CharField(choices=[('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10)),
+                ('file', models.ImageField(storage=editor.storage.ContentAddressedStorage(), upload_to='renditions')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('image_edit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='editor.imageedit')),
+            ],
+            options={
+                'ordering': ['image_edit', 'format', 'width'],
+                'constraints': [models.UniqueConstraint(fields=('image_edit', 'width', 'format'), name='unique_image_rendition')],
+            },
+        ),
+    ]
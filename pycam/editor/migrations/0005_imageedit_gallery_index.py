@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0004_imagerendition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imageedit',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='imageedit_user_created_idx'),
+        ),
+    ]
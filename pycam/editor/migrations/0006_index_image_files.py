@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:07
+
+import editor.models
+import editor.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('editor', '0005_imageedit_gallery_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imageedit',
+            name='edited_image',
+            field=models.ImageField(blank=True, db_index=True, storage=editor.storage.ContentAddressedStorage(), upload_to=editor.models.get_image_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='imageedit',
+            name='original_image',
+            field=models.ImageField(db_index=True, storage=editor.storage.ContentAddressedStorage(), upload_to=editor.models.get_image_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='imagerendition',
+            name='file',
+            field=models.ImageField(db_index=True, storage=editor.storage.ContentAddressedStorage(), upload_to='renditions'),
+        ),
+    ]
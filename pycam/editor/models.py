@@ -1,12 +1,18 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.urls import reverse
 import os
+import uuid
+
+from . import cleanup
+from .storage import blob_storage
 
 
 def get_image_upload_path(instance, filename):
     """
     Define a custom upload path for images.
     Images will be organized by user ID to keep them separate.
+    Image edits are stored by content hash instead, see storage.py.
     """
     return os.path.join('user_uploads', f'user_{instance.user.id}', filename)
 
@@ -29,14 +35,13 @@ class Image(models.Model):
     def delete(self, *args, **kwargs):
         """
         Override delete method to also delete the image file
-        when the model instance is deleted.
+        once the model instance is deleted.
         """
         if self.file:
-            if os.path.isfile(self.file.path):
-                os.remove(self.file.path)
+            cleanup.defer(self.file.storage.delete, self.file.name)
 
         # Call the parent class's delete method
-        super().delete(*args, **kwargs)
+        return super().delete(*args, **kwargs)
 
 
 class ImageEdit(models.Model):
@@ -44,8 +49,11 @@ class ImageEdit(models.Model):
     Model to store edited versions of images with effects applied.
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='image_edits')
-    original_image = models.ImageField(upload_to=get_image_upload_path)
-    edited_image = models.ImageField(upload_to=get_image_upload_path, blank=True)
+    # Stored by content hash, so an unedited copy doesn't take up space twice.
+    # Indexed to count the references to a file before deleting it
+    original_image = models.ImageField(upload_to=get_image_upload_path, storage=blob_storage, db_index=True)
+    edited_image = models.ImageField(upload_to=get_image_upload_path, storage=blob_storage, blank=True,
+                                     db_index=True)
     effect_applied = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -53,22 +61,210 @@ class ImageEdit(models.Model):
     def __str__(self):
         return f"{self.user.username}'s image edit ({self.id}) - {self.effect_applied}"
 
+    @property
+    def webp_srcset(self):
+        """srcset of the WebP gallery renditions"""
+        return self.get_srcset(ImageRendition.FORMAT_WEBP)
+
+    @property
+    def jpeg_srcset(self):
+        """srcset of the JPEG gallery renditions"""
+        return self.get_srcset(ImageRendition.FORMAT_JPEG)
+
+    @property
+    def thumbnail_url(self):
+        """URL of a JPEG rendition for browsers without srcset support"""
+        renditions = self.get_renditions(ImageRendition.FORMAT_JPEG)
+        if renditions:
+            return renditions[min(1, len(renditions) - 1)].file.url
+        return reverse('image_rendition', args=[self.id, ImageRendition.WIDTHS[1], ImageRendition.FORMAT_JPEG])
+
+    def get_renditions(self, format):
+        """Return the renditions in a format, smallest first. Uses prefetched renditions."""
+        return sorted((r for r in self.renditions.all() if r.format == format), key=lambda r: r.width)
+
+    def get_srcset(self, format):
+        """
+        Return a srcset of the renditions in a format. Images saved before
+        renditions existed point at the view that generates them.
+        """
+        renditions = self.get_renditions(format)
+        if renditions:
+            return ', '.join(f'{r.file.url} {r.width}w' for r in renditions)
+        return ', '.join(f"{reverse('image_rendition', args=[self.id, width, format])} {width}w"
+                         for width in ImageRendition.WIDTHS)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # The gallery pages through a user's images newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='imageedit_user_created_idx'),
+        ]
 
     def delete(self, *args, **kwargs):
         """
         Override delete method to also delete the image files
-        when the model instance is deleted.
+        when no other image edit uses them.
         """
-        # Delete the image files from storage
-        if self.original_image:
-            if os.path.isfile(self.original_image.path):
-                os.remove(self.original_image.path)
-
-        if self.edited_image:
-            if os.path.isfile(self.edited_image.path):
-                os.remove(self.edited_image.path)
+        names = [image.name for image in (self.original_image, self.edited_image) if image]
+        names += [rendition.file.name for rendition in self.renditions.all()]
 
         # Call the parent class's delete method
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+
+        # Delete the image files from storage in the background
+        cleanup.defer(release_files, *names)
+        return result
+
+
+def delete_image_edits(image_edits):
+    """
+    Delete a queryset of image edits in one query and queue all their
+    files for cleanup as one batch. Returns the number of image edits deleted.
+    """
+    rows = list(image_edits.values_list('id', 'original_image', 'edited_image'))
+    ids = [row[0] for row in rows]
+    names = [name for row in rows for name in row[1:] if name]
+    names += ImageRendition.objects.filter(image_edit__in=ids).values_list('file', flat=True)
+
+    ImageEdit.objects.filter(id__in=ids).delete()
+    cleanup.defer(release_files, *names)
+    return len(ids)
+
+
+def release_files(*names):
+    """
+    Delete stored image files that no image edit refers to any more.
+    Files are shared by content, so the references are counted first, with
+    the files locked so no image can start using one before it is deleted.
+    """
+    names = set(name for name in names if name)
+    with transaction.atomic():
+        lock_files(names)
+        in_use = set()
+        for field in ('original_image', 'edited_image'):
+            in_use.update(ImageEdit.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+        in_use.update(ImageRendition.objects.filter(file__in=names).values_list('file', flat=True))
+
+        unused = names - in_use
+        for name in unused:
+            blob_storage.delete(name)
+        StoredFile.objects.filter(name__in=unused).delete()
+
+
+def lock_files(names):
+    """
+    Lock stored files until the current transaction ends.
+
+    Content-addressed files are reused by name (see storage.py), so saving
+    an image that refers to an existing file races with release_files
+    deleting it. Both take these row locks first; after taking them a saver
+    must check its files still exist.
+    """
+    names = sorted(set(name for name in names if name))
+    StoredFile.objects.bulk_create([StoredFile(name=name) for name in names], ignore_conflicts=True)
+    # Locked in name order, so two transactions never wait on each other
+    list(StoredFile.objects.select_for_update().filter(name__in=names).order_by('name'))
+
+
+class StoredFile(models.Model):
+    """
+    Lock row of a content-addressed file, see lock_files.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ImageRendition(models.Model):
+    """
+    Smaller copy of an edited image for the gallery (see renditions.py),
+    in several widths and formats for srcset.
+    """
+    WIDTHS = (320, 640, 1280)
+
+    FORMAT_WEBP = 'webp'
+    FORMAT_JPEG = 'jpeg'
+    FORMAT_CHOICES = [
+        (FORMAT_WEBP, 'WebP'),
+        (FORMAT_JPEG, 'JPEG'),
+    ]
+
+    image_edit = models.ForeignKey(ImageEdit, on_delete=models.CASCADE, related_name='renditions')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    file = models.ImageField(upload_to='renditions', storage=blob_storage, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.width}px {self.format} rendition of image edit {self.image_edit_id}"
+
+    class Meta:
+        ordering = ['image_edit', 'format', 'width']
+        constraints = [
+            models.UniqueConstraint(fields=['image_edit', 'width', 'format'], name='unique_image_rendition'),
+        ]
+
+
+class EffectJob(models.Model):
+    """
+    Effect work queued for the background worker (manage.py run_effect_worker).
+    The input image is stored on the job so workers need nothing else.
+    """
+    KIND_APPLY = 'apply'
+    KIND_SAVE = 'save'
+    KIND_CHOICES = [
+        (KIND_APPLY, 'Apply effect'),
+        (KIND_SAVE, 'Save image'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='effect_jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+
+    # What to do
+    effect = models.CharField(max_length=200)
+    params = models.JSONField(default=dict, blank=True)
+    steps = models.JSONField(null=True, blank=True)
+    max_edge = models.PositiveIntegerField(null=True, blank=True)
+    input_data = models.BinaryField(null=True)
+    input_format = models.CharField(max_length=10)
+
+    # Outcome
+    result_data = models.BinaryField(null=True)
+    result_width = models.PositiveIntegerField(null=True, blank=True)
+    result_height = models.PositiveIntegerField(null=True, blank=True)
+    image_edit = models.ForeignKey(ImageEdit, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    # Times a worker has claimed the job, see jobs.get_max_attempts()
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.effect} job for {self.user.username} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # Workers look for the oldest queued job
+            models.Index(fields=['status', 'created_at']),
+        ]
@@ -0,0 +1,178 @@
+"""
+Process pool used to run effect work on several cores
+
+Every process that renders effects (each gunicorn worker, the job worker,
+runserver) has its own pool of EFFECT_POOL_WORKERS processes. Unset, that is
+one per physical core, which is right for a single process. Under gunicorn
+the pools together should not outnumber the cores, so gunicorn_config.py
+sets EFFECT_POOL_WORKERS to the cores divided by the number of web workers,
+at least one. A pool of one process is never used for tiling or previews,
+so those workers render in the request instead.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+# Set in the pool's own worker processes, which must not start pools of their own
+_in_worker = False
+
+# How pool processes start. Forking copies a process mid-request, with the
+# locks other threads (request threads, psycopg_pool's workers) hold and its
+# open database sockets, so workers come from a clean forkserver process
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def physical_cores():
+    """Number of physical CPU cores this process may use.
+
+    Hyper-threads share a core's execution units, so CPU-bound rendering
+    gains little from them. Falls back to the logical CPU count where
+    /proc/cpuinfo doesn't list cores.
+    """
+    cores = set()
+    try:
+        with open('/proc/cpuinfo') as f:
+            physical_id = None
+            for line in f:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    cores.add((physical_id, value.strip()))
+    except OSError:
+        pass
+
+    available = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    # Containers may be limited to fewer CPUs than the host has cores
+    return min(len(cores), available) if cores else available
+
+
+def get_pool_size():
+    """Number of worker processes, from EFFECT_POOL_WORKERS or the physical core count."""
+    if _in_worker:
+        return 1
+    return getattr(settings, 'EFFECT_POOL_WORKERS', None) or physical_cores()
+
+
+def offload_enabled():
+    """Whether the image views render in the pool rather than the request thread (EFFECT_POOL_OFFLOAD)."""
+    return getattr(settings, 'EFFECT_POOL_OFFLOAD', False) and not _in_worker
+
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    # Workers start from a fresh interpreter, without the web worker's setup
+    import django
+    django.setup()
+
+
+def get_process_pool():
+    """Return this process's effect pool, creating it on first use."""
+    global _pool, _pool_pid
+    with _lock:
+        # A pool doesn't survive a fork (gunicorn preloads the app and then
+        # forks workers), so each process creates its own
+        if _pool is None or _pool_pid != os.getpid():
+            size = get_pool_size()
+            _pool = ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context(START_METHOD),
+                                        initializer=_init_worker)
+            _pool_pid = os.getpid()
+            stats.reset(size)
+        return _pool
+
+
+class PoolStats:
+    """Queue depth and latency counters of this process's effect pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset(0)
+
+    def reset(self, workers):
+        with self._lock:
+            self.workers = workers
+            self.depth = 0
+            self.max_depth = 0
+            self.submitted = 0
+            self.completed = 0
+            self.failed = 0
+            self.total_seconds = 0.0
+
+    def started(self):
+        with self._lock:
+            self.submitted += 1
+            self.depth += 1
+            self.max_depth = max(self.max_depth, self.depth)
+
+    def finished(self, seconds, failed):
+        with self._lock:
+            self.depth = max(0, self.depth - 1)
+            self.completed += 1
+            self.failed += failed
+            self.total_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                # Tasks submitted and not finished, and those of them still
+                # waiting for a free worker process
+                'depth': self.depth,
+                'queued': max(0, self.depth - self.workers),
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'average_ms': round(1000 * self.total_seconds / self.completed, 1) if self.completed else 0,
+            }
+
+
+stats = PoolStats()
+
+
+def submit(func, *args):
+    """Run func(*args) in the effect pool, counting it in the pool stats.
+
+    Returns:
+        The task's Future
+    """
+    pool = get_process_pool()
+    start = time.monotonic()
+    stats.started()
+    try:
+        future = pool.submit(func, *args)
+    except Exception:
+        stats.finished(0, failed=True)
+        raise
+    future.add_done_callback(
+        lambda done: stats.finished(time.monotonic() - start, not done.cancelled() and done.exception() is not None))
+    return future
+
+
+def run(func, *args):
+    """Run func(*args) in the effect pool and wait for its result."""
+    return submit(func, *args).result()
+
+
+def get_stats():
+    """Return the effect pool's queue depth and latency counters."""
+    return {'pid': os.getpid(), **stats.snapshot()}
+
+
+def shutdown_pool():
+    """Stop the pool's worker processes, if it was started in this process."""
+    global _pool
+    with _lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
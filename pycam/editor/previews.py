@@ -0,0 +1,54 @@
+"""
+Thumbnail previews of every effect from a single decode
+"""
+import io
+
+from django.conf import settings
+
+from .effects import apply_effect, EFFECTS
+from . import pool
+from .pool import get_pool_size
+
+# Thumbnails are small, so a lossy format keeps the response compact
+PREVIEW_FORMAT = 'JPEG'
+PREVIEW_QUALITY = 80
+
+
+def get_thumbnail_edge():
+    """Longest edge of effect thumbnails in pixels (EFFECT_THUMBNAIL_EDGE)."""
+    return getattr(settings, 'EFFECT_THUMBNAIL_EDGE', 160)
+
+
+def render_previews(image, effect_names=None, params=None, parallel=None):
+    """Apply each effect to the same thumbnail and return encoded previews.
+
+    Args:
+        image: The decoded thumbnail, shared by every effect
+        effect_names: Effects to render, defaults to every registered effect
+        params: Optional dict of parameters for each effect name
+        parallel: Render in the process pool; by default only when more
+            than one worker is available
+
+    Returns:
+        Dict of effect name to JPEG bytes, in the order requested
+    """
+    effect_names = list(effect_names or EFFECTS)
+    params = params or {}
+    if parallel is None:
+        parallel = get_pool_size() > 1 and len(effect_names) > 1
+
+    # Decode once here rather than in every worker
+    image.load()
+    if not parallel:
+        return {name: render_preview(image, name, params.get(name, {})) for name in effect_names}
+
+    futures = {name: pool.submit(render_preview, image, name, params.get(name, {})) for name in effect_names}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def render_preview(image, effect_name, params):
+    """Apply one effect to a thumbnail and encode the result."""
+    result = apply_effect(image, effect_name, tiled=False, **params)
+    buffer = io.BytesIO()
+    result.save(buffer, format=PREVIEW_FORMAT, quality=PREVIEW_QUALITY)
+    return buffer.getvalue()
@@ -0,0 +1,49 @@
+"""
+Signed tokens that let a save reuse the render the user previewed
+"""
+from django.conf import settings
+from django.core import signing
+
+from . import result_cache
+
+SALT = 'editor.render-token'
+
+
+def get_max_age():
+    """Seconds a render token stays valid (EFFECT_RENDER_TOKEN_MAX_AGE)."""
+    return getattr(settings, 'EFFECT_RENDER_TOKEN_MAX_AGE', 60 * 60)
+
+
+def make_render_token(user_id, cache_key, effect_name, params, full_size, source):
+    """Return a token pointing at a rendered result in the result cache.
+
+    `full_size` says whether the render is at the image's full resolution;
+    only those can be saved as they are. `source` is the sha256 digest of
+    the photo the render was made from.
+    """
+    return signing.dumps({
+        'user': user_id,
+        'key': cache_key,
+        'effect': effect_name,
+        'params': params,
+        'full': full_size,
+        'source': source,
+    }, salt=SALT, compress=True)
+
+
+def load_render_result(token, user_id, effect_name, params, source):
+    """Return the cached render a token points at, or None if it can't be reused.
+
+    The token must be valid and unexpired, belong to the user, match the
+    effect, parameters and photo (`source`) being saved and point at a
+    full-size render that is still cached.
+    """
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=get_max_age())
+    except signing.BadSignature:
+        return None
+
+    if (payload['user'] != user_id or payload['effect'] != effect_name
+            or payload['params'] != params or payload['source'] != source or not payload['full']):
+        return None
+    return result_cache.get_result(payload['key'])
@@ -0,0 +1,126 @@
+"""
+Rendering and saving of effects, shared by the views and the job worker
+"""
+import io
+import time
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from . import pool
+from .decode import decode_image
+from .effects import apply_effect, apply_pipeline
+from .models import ImageEdit, ImageRendition, lock_files, release_files
+from .storage import blob_storage
+from .renditions import build_renditions
+
+
+def render(image_data, ext, effect_name, params=None, steps=None, max_edge=None, progress=None):
+    """Decode an image, apply an effect or a pipeline and encode the result.
+
+    Args:
+        image_data: Encoded input image bytes
+        ext: Output format, e.g. 'jpeg' or 'png'
+        effect_name: Effect to apply when there are no pipeline steps
+        params: Parameters of the effect
+        steps: Optional list of (effect name, params) pipeline steps
+        max_edge: Render on a proxy no longer than this, see decode_image
+        progress: Optional callback receiving a 0-100 percentage
+
+    Returns:
+        Dict with the encoded 'data', its 'format', 'width' and 'height'
+    """
+    report = progress or (lambda percent: None)
+
+    img = decode_image(image_data, max_edge=max_edge)
+    report(20)
+
+    if steps:
+        processed_image = apply_pipeline(img, steps)
+    else:
+        processed_image = apply_effect(img, effect_name, **(params or {}))
+    report(80)
+
+    buffer = io.BytesIO()
+    processed_image.save(buffer, format=ext.upper())
+    report(95)
+
+    return {
+        'data': buffer.getvalue(),
+        'format': ext,
+        'width': processed_image.width,
+        'height': processed_image.height,
+    }
+
+
+def save_edit(user, original_data, ext, effect_name, params=None, progress=None, edited_data=None):
+    """Render an effect at full resolution and save both versions to the gallery.
+
+    Pass `edited_data` to save an already rendered result instead.
+
+    Returns:
+        The new ImageEdit
+    """
+    report = progress or (lambda percent: None)
+
+    if edited_data is None:
+        edited_data = original_data
+        if effect_name and effect_name != 'original':
+            if pool.offload_enabled():
+                # Progress callbacks can't cross into the pool
+                edited_data = pool.run(render, original_data, ext, effect_name, params)['data']
+            else:
+                # Leave the last few percent for writing the files
+                edited_data = render(original_data, ext, effect_name, params,
+                                     progress=lambda percent: report(percent * 9 // 10))['data']
+
+    # Create unique identifier for this image
+    timestamp = int(time.time())
+    unique_id = f"{user.id}_{timestamp}"
+
+    image_edit = store_edit(user, effect_name,
+                            f"original_{unique_id}.{ext}", original_data,
+                            f"edited_{unique_id}_{effect_name}.{ext}", edited_data)
+    report(100)
+    return image_edit
+
+
+def store_edit(user, effect_name, original_name, original_data, edited_name, edited_data):
+    """Write an edit's files to storage, then record it in one short transaction.
+
+    All the slow work (storage writes, gallery renditions, encoded in the
+    effect pool when offloading is on) happens before the transaction, so it
+    only covers the inserts. Files are written first so a
+    committed row never points at a missing file; if the transaction fails,
+    the files no other image shares are removed again. The transaction locks
+    the files (lock_files) against a concurrent release.
+
+    Returns:
+        The new ImageEdit
+    """
+    image_edit = ImageEdit(user=user, effect_applied=effect_name)
+    image_edit.original_image.save(original_name, ContentFile(original_data), save=False)
+    image_edit.edited_image.save(edited_name, ContentFile(edited_data), save=False)
+    gallery_renditions = build_renditions(edited_data)
+
+    try:
+        with transaction.atomic():
+            # Keep release_files off these files until the row is in, and
+            # put back any it deleted after they were written
+            lock_files([image_edit.original_image.name, image_edit.edited_image.name,
+                        *[rendition.file.name for rendition in gallery_renditions]])
+            for field, data in [(image_edit.original_image, original_data), (image_edit.edited_image, edited_data)]:
+                if not blob_storage.exists(field.name):
+                    blob_storage.save(field.name, ContentFile(data))
+            # Renditions are made again on demand
+            gallery_renditions = [r for r in gallery_renditions if blob_storage.exists(r.file.name)]
+
+            image_edit.save()
+            for rendition in gallery_renditions:
+                rendition.image_edit = image_edit
+            ImageRendition.objects.bulk_create(gallery_renditions)
+    except Exception:
+        release_files(image_edit.original_image.name, image_edit.edited_image.name,
+                      *[rendition.file.name for rendition in gallery_renditions])
+        raise
+    return image_edit
@@ -0,0 +1,159 @@
+"""
+Gallery renditions: smaller WebP and JPEG copies of saved images
+"""
+import io
+import logging
+import math
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError, features
+
+from .decode import decode_image, read_header, ImageTooLargeError
+from . import pool
+from .models import ImageRendition, lock_files
+from .storage import blob_storage
+
+logger = logging.getLogger(__name__)
+
+# Encoder settings for each rendition format
+ENCODE_OPTIONS = {
+    ImageRendition.FORMAT_WEBP: {'format': 'WEBP', 'quality': 80, 'method': 4},
+    ImageRendition.FORMAT_JPEG: {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+
+def get_formats():
+    """Return the rendition formats Pillow can write, WebP first."""
+    if features.check('webp'):
+        return [ImageRendition.FORMAT_WEBP, ImageRendition.FORMAT_JPEG]
+    return [ImageRendition.FORMAT_JPEG]
+
+
+def get_widths(image_width):
+    """Return the rendition widths for an image, never upscaling.
+
+    Images narrower than the largest width also get a rendition at their
+    own width, so large screens still see every pixel.
+    """
+    widths = [width for width in ImageRendition.WIDTHS if width < image_width]
+    widths.append(min(image_width, ImageRendition.WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def generate_renditions(image_edit, data=None):
+    """Create and record the missing renditions of an image edit.
+
+    Args:
+        image_edit: A saved ImageEdit
+        data: The encoded edited image, read from storage if not given
+
+    Returns:
+        List of the ImageRenditions that were created. Images that can't be
+        decoded are logged and get none, the view retries on demand.
+    """
+    if not image_edit.edited_image:
+        return []
+
+    try:
+        if data is None:
+            with image_edit.edited_image.open('rb') as f:
+                data = f.read()
+    except OSError as e:
+        logger.warning(f"Could not read image edit {image_edit.id}: {str(e)}")
+        return []
+
+    existing = set(image_edit.renditions.values_list('width', 'format'))
+    renditions = build_renditions(data, existing)
+    for rendition in renditions:
+        rendition.image_edit = image_edit
+    with transaction.atomic():
+        # A concurrent release_files may have deleted a reused file
+        lock_files([rendition.file.name for rendition in renditions])
+        renditions = [r for r in renditions if blob_storage.exists(r.file.name)]
+        # Another request may be making the same renditions
+        ImageRendition.objects.bulk_create(renditions, ignore_conflicts=True)
+    return renditions
+
+
+def build_renditions(data, existing=()):
+    """Make an edited image's renditions and write their files, without touching the database.
+
+    The resizing and encoding runs in the effect pool when offloading is on
+    (see encode_renditions); the files are written here. Set `image_edit`
+    on the returned renditions before saving them.
+
+    Args:
+        data: The encoded edited image
+        existing: (width, format) pairs to skip
+
+    Returns:
+        List of unsaved ImageRenditions, empty if the image can't be decoded
+    """
+    if pool.offload_enabled():
+        encoded = pool.run(encode_renditions, data, set(existing))
+    else:
+        encoded = encode_renditions(data, existing)
+
+    renditions = []
+    for width, height, format, rendition_data in encoded:
+        rendition = ImageRendition(width=width, height=height, format=format)
+        rendition.file.save(f'{width}.{format}', ContentFile(rendition_data), save=False)
+        renditions.append(rendition)
+    return renditions
+
+
+def encode_renditions(data, existing=()):
+    """Resize and encode an edited image at every rendition width and format.
+
+    The image is decoded once, at no more than the largest rendition size,
+    and every width and format is made from it.
+
+    Returns:
+        List of (width, height, format, bytes), empty if the image can't be decoded
+    """
+    try:
+        # The header size is before EXIF rotation, so size by the short edge
+        # to keep enough pixels for the widest rendition either way
+        size = read_header(data).size
+        scale = min(1, ImageRendition.WIDTHS[-1] / min(size))
+        img = decode_image(data, max_edge=math.ceil(max(size) * scale))
+    except (OSError, UnidentifiedImageError, ImageTooLargeError) as e:
+        logger.warning(f"Could not make gallery renditions: {str(e)}")
+        return []
+
+    encoded = []
+    for width in get_widths(img.width):
+        resized = None
+        for format in get_formats():
+            if (width, format) in existing:
+                continue
+            if resized is None:
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.Resampling.LANCZOS) if width < img.width else img
+
+            buffer = io.BytesIO()
+            resized.save(buffer, **ENCODE_OPTIONS[format])
+            encoded.append((width, resized.height, format, buffer.getvalue()))
+    return encoded
+
+
+def find_rendition(image_edit, width, format):
+    """Return the rendition closest to a width, generating them if needed.
+
+    The smallest rendition at least `width` wide is preferred, then the
+    widest one. Returns None if the image has no renditions.
+    """
+    if format not in get_formats():
+        format = ImageRendition.FORMAT_JPEG
+    renditions = list(image_edit.renditions.filter(format=format).order_by('width'))
+    if not renditions:
+        generate_renditions(image_edit)
+        renditions = list(image_edit.renditions.filter(format=format).order_by('width'))
+    if not renditions:
+        return None
+
+    for rendition in renditions:
+        if rendition.width >= width:
+            return rendition
+    return renditions[-1]
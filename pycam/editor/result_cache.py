@@ -0,0 +1,119 @@
+"""
+Content-addressed cache of rendered effect results
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .lru import LRUCache
+
+# Prefix for keys in the shared Django cache
+KEY_PREFIX = 'effect-result'
+
+
+def _result_size(result):
+    """Approximate memory used by a cached result."""
+    return len(result['data'])
+
+
+# In-process layer, private to each gunicorn worker
+LOCAL_CACHE = LRUCache(
+    max_entries=getattr(settings, 'EFFECT_RESULT_CACHE_ENTRIES', 64),
+    max_bytes=getattr(settings, 'EFFECT_RESULT_CACHE_BYTES', 128 * 1024 * 1024),
+    sizeof=_result_size,
+)
+
+_shared_stats = {'hits': 0, 'misses': 0, 'errors': 0}
+_stats_lock = threading.Lock()
+
+
+def image_digest(image_data):
+    """Return the sha256 hex digest of encoded image bytes.
+
+    Computed once per request: it goes into the cache key and, as the
+    render's source, into its render token.
+    """
+    # sha256 is hardware accelerated on current CPUs: ~1 ms per megabyte
+    return hashlib.sha256(image_data).hexdigest()
+
+
+def make_key(digest, effect_name, params=None, **options):
+    """Build a cache key from the input's digest, the effect and its settings.
+
+    `digest` is the image_digest() of the encoded upload and `options` holds
+    anything else that changes the output, such as the preview size or the
+    output format.
+    """
+    key = hashlib.sha256(digest.encode('ascii'))
+    # Sorted JSON so equal parameters always give the same key
+    settings_json = json.dumps([effect_name, params or {}, options], sort_keys=True, default=str)
+    key.update(settings_json.encode('utf-8'))
+    return key.hexdigest()
+
+
+def get_shared_cache():
+    """Return the Django cache shared by all workers, if one is configured.
+
+    Set EFFECT_RESULT_CACHE_ALIAS to the name of an entry in CACHES
+    (e.g. a Redis or memcached cache) to enable it.
+    """
+    alias = getattr(settings, 'EFFECT_RESULT_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def get_result(key):
+    """Return a cached result, checking this process first, or None."""
+    result = LOCAL_CACHE.get(key)
+    if result is not None:
+        return result
+
+    shared = get_shared_cache()
+    if shared is None:
+        return None
+    try:
+        result = shared.get(f'{KEY_PREFIX}:{key}')
+    except Exception:
+        # The shared cache is an optimization; never fail a request over it
+        _count('errors')
+        return None
+    _count('hits' if result is not None else 'misses')
+    if result is not None:
+        LOCAL_CACHE.set(key, result)
+    return result
+
+
+def set_result(key, result):
+    """Store a result in both cache layers."""
+    LOCAL_CACHE.set(key, result)
+    shared = get_shared_cache()
+    if shared is None:
+        return
+    try:
+        shared.set(f'{KEY_PREFIX}:{key}', result,
+                   timeout=getattr(settings, 'EFFECT_RESULT_CACHE_TIMEOUT', 60 * 60))
+    except Exception:
+        _count('errors')
+
+
+def get_stats():
+    """Return hit/miss counters for both cache layers."""
+    with _stats_lock:
+        shared = dict(_shared_stats)
+    shared['enabled'] = get_shared_cache() is not None
+    return {'local': LOCAL_CACHE.stats(), 'shared': shared}
+
+
+def clear():
+    """Empty the local layer and reset all counters."""
+    LOCAL_CACHE.clear()
+    with _stats_lock:
+        for name in _shared_stats:
+            _shared_stats[name] = 0
+
+
+def _count(name):
+    with _stats_lock:
+        _shared_stats[name] += 1
@@ -0,0 +1,86 @@
+"""
+Content-addressed storage for saved images
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import Storage, default_storage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+
+
+def blob_name(digest, ext):
+    """Return the stored name for content with a sha256 `digest`.
+
+    Names are sharded on the first two byte pairs of the digest, e.g.
+    blobs/ab/cd/abcd....png, so no directory grows past 65,536 entries.
+    """
+    return '/'.join([BLOB_DIR, digest[:2], digest[2:4], f'{digest}{ext}'])
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    """File storage that names files by the hash of their contents.
+
+    Saving bytes that are already stored writes nothing and returns the
+    existing name, so identical files are kept once however many images
+    refer to them. Files are shared, so only delete one when nothing refers
+    to it any more, see models.release_files.
+
+    Files live in the project's default storage (local disk or Cloudinary),
+    so only the storage API is used: no local paths.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+
+    @property
+    def backend(self):
+        return self._backend or default_storage
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        name = blob_name(digest.hexdigest(), os.path.splitext(name)[1].lower())
+        if self.exists(name):
+            return name
+        # Two saves of new content can race here; the loser is stored under
+        # a suffixed name, which is wasteful but still correct
+        return self.backend.save(name, content, max_length=max_length)
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def delete(self, name):
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+blob_storage = ContentAddressedStorage()
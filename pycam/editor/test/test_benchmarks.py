@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from editor.benchmarks import run_benchmarks, find_regressions
+
+
+class BenchmarksTestCase(SimpleTestCase):
+    """Test suite for the effect benchmark helpers."""
+
+    def test_run_benchmarks_records_each_case(self):
+        """Test every effect, mode and size gets a measurement or an error."""
+        results = run_benchmarks(['invert', 'emboss'], [0.01], ['RGB', 'P'], repeat=1)
+
+        self.assertEqual(set(results), {'invert/RGB/0.01', 'invert/P/0.01', 'emboss/RGB/0.01', 'emboss/P/0.01'})
+        invert = results['invert/RGB/0.01']
+        self.assertGreater(invert['wall_time'], 0)
+        self.assertGreater(invert['peak_memory'], 0)
+        self.assertGreaterEqual(invert['allocations'], 1)
+
+    def test_find_regressions(self):
+        """Test slowdowns past the threshold are reported and small noise is not."""
+        baseline = {
+            'blur/RGB/2': {'wall_time': 0.100, 'peak_memory': 1000, 'megapixels': 2},
+            'invert/RGB/2': {'wall_time': 0.001, 'peak_memory': 1000, 'megapixels': 2},
+            'emboss/RGB/2': {'wall_time': 0.050, 'peak_memory': 1000, 'megapixels': 2},
+        }
+        results = {
+            'blur/RGB/2': {'wall_time': 0.150, 'peak_memory': 1000, 'megapixels': 2},
+            'invert/RGB/2': {'wall_time': 0.002, 'peak_memory': 1100, 'megapixels': 2},
+            'emboss/RGB/2': {'error': 'ValueError: cannot filter palette images'},
+        }
+
+        problems = find_regressions(results, baseline, threshold=20)
+
+        self.assertEqual(len(problems), 2)
+        self.assertIn('blur/RGB/2: wall time', problems[0])
+        self.assertIn('emboss/RGB/2: now fails', problems[1])
+
+    def test_find_regressions_checks_time_budgets(self):
+        """Test effects over their per-megapixel budget fail without a baseline."""
+        results = {'cartoon/RGB/2': {'wall_time': 3.0, 'peak_memory': 1000, 'megapixels': 2}}
+        with patch.dict('editor.benchmarks.TIME_BUDGETS', {'cartoon': 1.0}):
+            problems = find_regressions(results, {})
+        self.assertEqual(len(problems), 1)
+        self.assertIn('budget', problems[0])
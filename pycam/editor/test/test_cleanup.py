@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from editor import cleanup
+from editor.models import Image
+
+
+class CleanupTestCase(TestCase):
+    """Test suite for the background file cleanup queue."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_runs_in_background_after_commit(self):
+        """Test deferred cleanup waits for the commit and runs on another thread."""
+        threads = []
+        with self.captureOnCommitCallbacks(execute=True):
+            cleanup.defer(lambda: threads.append(threading.current_thread()))
+            self.assertEqual(threads, [])
+
+        self.assertTrue(cleanup.wait(5))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_nothing_runs_on_rollback(self):
+        """Test files aren't cleaned up for a transaction that rolled back."""
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    cleanup.defer(calls.append, 'file.png')
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertTrue(cleanup.wait(5))
+        self.assertEqual(calls, [])
+
+    def test_failures_are_logged(self):
+        """Test a failing cleanup is logged and the queue keeps working."""
+        calls = []
+
+        def fail():
+            raise OSError('storage unavailable')
+
+        with self.assertLogs('editor.cleanup', level='ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                cleanup.defer(fail)
+                cleanup.defer(calls.append, 'file.png')
+            self.assertTrue(cleanup.wait(5))
+        self.assertEqual(calls, ['file.png'])
+
+    @override_settings(FILE_CLEANUP_IN_BACKGROUND=False)
+    def test_image_file_deleted_after_commit(self):
+        """Test deleting an Image removes its file through the storage once the row is gone."""
+        user = User.objects.create_user(username='testuser', password='testpassword')
+        image = Image(user=user)
+        image.file.save('photo.png', ContentFile(b'photo'), save=False)
+        image.save()
+        storage, name = image.file.storage, image.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+            self.assertTrue(storage.exists(name))
+        self.assertFalse(storage.exists(name))
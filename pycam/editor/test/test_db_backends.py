@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.db import connections, transaction
+from django.db.utils import IntegrityError, OperationalError
+from django.test import SimpleTestCase, override_settings
+
+from pycam.db_backends import retry
+from pycam.db_backends.base import DatabaseWrapper
+
+LOCKED = OperationalError('database is locked')
+
+
+@override_settings(DB_RETRY={'MAX_ATTEMPTS': 3, 'REQUEST_BUDGET': None, 'BREAKER_THRESHOLD': 2,
+                             'BREAKER_RESET': 30})
+@patch('pycam.db_backends.retry.time.sleep')
+class RetryWrapperTestCase(SimpleTestCase):
+    """Test suite for the retrying database backend."""
+
+    def setUp(self):
+        retry.breakers.clear()
+        # Requests made by other tests leave a budget in this context
+        token = retry._request_budget.set(None)
+        self.addCleanup(retry._request_budget.reset, token)
+        self.connection = MagicMock(alias='test', in_atomic_block=False)
+        self.context = {'connection': self.connection, 'cursor': MagicMock()}
+
+    def run_query(self, *outcomes):
+        """Run a query through the wrapper, each attempt raising or returning the next outcome."""
+        execute = MagicMock(side_effect=outcomes)
+        return retry.RetryWrapper()(execute, 'SELECT 1', None, False, self.context), execute
+
+    def test_locked_database_is_retried_with_backoff(self, mock_sleep):
+        """Test a locked database is retried on the same connection with growing jittered delays."""
+        with patch('pycam.db_backends.retry.random.uniform', side_effect=lambda low, high: high):
+            result, execute = self.run_query(LOCKED, LOCKED, 'rows')
+
+        self.assertEqual(result, 'rows')
+        self.assertEqual(execute.call_count, 3)
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [0.05, 0.1])
+        self.connection.connect.assert_not_called()
+
+    def test_closed_database_reconnects_outside_transactions(self, mock_sleep):
+        """Test a closed connection is reopened, but never in the middle of a transaction."""
+        closed = OperationalError('Cannot operate on a closed database.')
+        result, _ = self.run_query(closed, 'rows')
+        self.assertEqual(result, 'rows')
+        self.connection.connect.assert_called_once()
+
+        self.connection.in_atomic_block = True
+        with self.assertRaises(OperationalError):
+            self.run_query(closed, 'rows')
+
+    def test_locked_database_is_not_retried_in_transactions(self, mock_sleep):
+        """Test a locked statement inside a transaction fails at once; its snapshot can't recover."""
+        self.connection.in_atomic_block = True
+        with self.assertRaises(OperationalError):
+            self.run_query(LOCKED, 'rows')
+        mock_sleep.assert_not_called()
+
+    def test_contention_in_transactions_does_not_open_breaker(self, mock_sleep):
+        """Test write contention inside transactions isn't counted as a database failure."""
+        self.connection.in_atomic_block = True
+        for _ in range(3):
+            with self.assertRaises(OperationalError):
+                self.run_query(LOCKED)
+        self.assertEqual(retry.get_breaker('test').state, retry.CircuitBreaker.CLOSED)
+        self.assertEqual(retry.get_breaker('test').failures, 0)
+
+    def test_other_errors_are_not_retried(self, mock_sleep):
+        """Test errors that a retry can't fix are raised straight away."""
+        with self.assertRaises(OperationalError):
+            self.run_query(OperationalError('no such table: foo'), 'rows')
+        mock_sleep.assert_not_called()
+        self.assertEqual(retry.get_breaker('test').state, retry.CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_and_fails_fast(self, mock_sleep):
+        """Test repeated failures open the breaker, which then fails without querying until reset."""
+        for _ in range(2):
+            with self.assertRaises(OperationalError):
+                self.run_query(LOCKED, LOCKED, LOCKED)
+        self.assertEqual(retry.get_breaker('test').state, retry.CircuitBreaker.OPEN)
+
+        execute = MagicMock()
+        with self.assertRaises(retry.CircuitOpenError):
+            retry.RetryWrapper()(execute, 'SELECT 1', None, False, self.context)
+        execute.assert_not_called()
+
+        # After the reset time one trial query closes it again
+        retry.get_breaker('test').opened_at -= 30
+        self.assertEqual(self.run_query('rows')[0], 'rows')
+        self.assertEqual(retry.get_breaker('test').state, retry.CircuitBreaker.CLOSED)
+
+    def test_breaker_closes_when_trial_hits_other_errors(self, mock_sleep):
+        """Test a half-open trial that fails with a non-transient error still closes the breaker."""
+        breaker = retry.get_breaker('test')
+        for _ in range(2):
+            with self.assertRaises(OperationalError):
+                self.run_query(LOCKED, LOCKED, LOCKED)
+        breaker.opened_at -= 30
+
+        with self.assertRaises(IntegrityError):
+            self.run_query(IntegrityError('UNIQUE constraint failed'))
+
+        self.assertEqual(breaker.state, retry.CircuitBreaker.CLOSED)
+        self.assertEqual(self.run_query('rows')[0], 'rows')
+
+    def test_request_budget_limits_retries(self, mock_sleep):
+        """Test a request stops retrying once its retry budget is spent."""
+        with self.settings(DB_RETRY={'REQUEST_BUDGET': 1}):
+            retry.reset_request_budget()
+            with self.assertRaises(OperationalError):
+                self.run_query(LOCKED, LOCKED, 'rows')
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertGreaterEqual(retry.get_stats()['budget_exhausted'], 1)
+
+
+@override_settings(SQLITE_PRAGMAS={'busy_timeout': 100}, DB_RETRY={'MAX_ATTEMPTS': 1})
+class SQLiteBackendTestCase(SimpleTestCase):
+    """Test suite for the SQLite connection settings of the custom backend."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'db.sqlite3')
+
+    def connect(self, alias):
+        """Open a connection to the temporary database, registered under `alias`."""
+        wrapper = DatabaseWrapper({**connections['default'].settings_dict, 'NAME': self.path}, alias)
+        connections[alias] = wrapper
+        self.addCleanup(delattr, connections._connections, alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas(self):
+        """Test new connections use WAL and the tuned pragmas."""
+        cursor = self.connect('tuned').cursor()
+        values = {}
+        for name in ['journal_mode', 'synchronous', 'busy_timeout', 'temp_store', 'cache_size']:
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+
+        self.assertEqual(values, {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 100, 'temp_store': 2, 'cache_size': -64000,
+        })
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 5000})
+    def test_read_then_write_transaction_survives_concurrent_commit(self):
+        """Test a transaction that reads, then writes, isn't broken by another connection's commit."""
+        first = self.connect('first')
+        first.cursor().execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        errors = []
+
+        def write_elsewhere():
+            other = DatabaseWrapper({**first.settings_dict}, 'other')
+            try:
+                other.cursor().execute('INSERT INTO item VALUES (2)')
+            except Exception as e:
+                errors.append(e)
+            finally:
+                other.close()
+
+        with transaction.atomic(using='first'):
+            first.cursor().execute('SELECT COUNT(*) FROM item')
+            writer = threading.Thread(target=write_elsewhere)
+            writer.start()
+            # Give the other connection time to try its write
+            writer.join(0.3)
+            first.cursor().execute('INSERT INTO item VALUES (1)')
+        writer.join()
+
+        self.assertEqual(errors, [])
+        cursor = first.cursor()
+        cursor.execute('SELECT id FROM item ORDER BY id')
+        self.assertEqual(cursor.fetchall(), [(1,), (2,)])
+
+    @override_settings(SQLITE_SERIALIZE_WRITES=True)
+    def test_serialized_writes(self):
+        """Test a transaction holds the writer lock until it ends, while reads go on."""
+        first, second = self.connect('first'), self.connect('second')
+        first.cursor().execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        self.assertFalse(first.holds_write_lock)
+
+        with transaction.atomic(using='first'):
+            first.cursor().execute('INSERT INTO item VALUES (1)')
+            self.assertTrue(first.holds_write_lock)
+            second.cursor().execute('SELECT * FROM item')
+            with self.assertRaisesMessage(OperationalError, 'database is locked'):
+                second.cursor().execute('INSERT INTO item VALUES (2)')
+
+        self.assertFalse(first.holds_write_lock)
+        second.cursor().execute('INSERT INTO item VALUES (2)')
+        self.assertFalse(second.holds_write_lock)
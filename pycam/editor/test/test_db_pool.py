@@ -0,0 +1,72 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.http import HttpResponse
+from django.urls import reverse
+
+from pycam.db_pool import get_pool_stats, warn_if_unpooled
+from pycam.middleware import DatabasePoolMetricsMiddleware
+
+
+class DatabasePoolTestCase(TestCase):
+    """Test suite for the connection pool metrics."""
+
+    def fake_pool(self, requests_num, requests_wait_ms):
+        pool = MagicMock()
+        pool.get_stats.return_value = {
+            'pool_size': 2, 'pool_available': 1, 'requests_num': requests_num,
+            'requests_wait_ms': requests_wait_ms, 'requests_errors': 0,
+        }
+        return pool
+
+    def test_unpooled_database(self):
+        """Test databases without a pool report their persistent connection settings."""
+        stats = get_pool_stats()[connection.alias]
+        self.assertFalse(stats['pooled'])
+        self.assertIn('conn_max_age', stats)
+
+    def test_pooled_database_reports_average_wait(self):
+        """Test pooled databases report the pool counters and the average wait."""
+        with patch.object(type(connections['default']), 'pool', self.fake_pool(4, 10), create=True):
+            stats = get_pool_stats()[connection.alias]
+        self.assertTrue(stats['pooled'])
+        self.assertEqual(stats['avg_wait_ms'], 2.5)
+
+    @override_settings(DB_POOL_METRICS_INTERVAL=0)
+    def test_middleware_logs_wait_since_last_report(self):
+        """Test the middleware logs checkouts and wait time since its previous report."""
+        middleware = DatabasePoolMetricsMiddleware(lambda request: HttpResponse())
+        request = RequestFactory().get('/')
+
+        with patch.object(type(connections['default']), 'pool', self.fake_pool(4, 10), create=True):
+            middleware(request)
+        with patch.object(type(connections['default']), 'pool', self.fake_pool(6, 30), create=True), \
+                self.assertLogs('pycam.middleware', level='INFO') as logs:
+            middleware(request)
+
+        self.assertIn('checkouts=2 wait_ms=20 avg_wait_ms=10.0', logs.output[0])
+
+    def test_warns_when_pool_is_dropped(self):
+        """Test a PostgreSQL database without the requested pool is logged."""
+        postgres = {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'pycam'}
+        with self.settings(DB_POOL_REQUESTED=True, DATABASES={'default': postgres}):
+            with self.assertLogs('pycam.db_pool', 'WARNING') as logs:
+                warn_if_unpooled()
+        self.assertIn('default', logs.output[0])
+
+        pooled = {**postgres, 'OPTIONS': {'pool': {'max_size': 4}}}
+        with self.settings(DB_POOL_REQUESTED=True, DATABASES={'default': pooled}):
+            with self.assertNoLogs('pycam.db_pool', 'WARNING'):
+                warn_if_unpooled()
+
+    def test_stats_view_is_staff_only(self):
+        """Test the pool stats endpoint is only for staff."""
+        User.objects.create_user(username='staff', password='staffpassword', is_staff=True)
+        response = self.client.get(reverse('database_pool_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='staff', password='staffpassword')
+        response = self.client.get(reverse('database_pool_stats'))
+        self.assertFalse(response.json()['default']['pooled'])
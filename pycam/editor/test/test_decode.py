@@ -0,0 +1,75 @@
+from io import BytesIO
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from PIL import Image, ImageFile, JpegImagePlugin
+
+from editor.benchmarks import make_test_image
+from editor.decode import decode_image, ImageTooLargeError
+
+
+def encode(image, format='JPEG'):
+    """Return the image encoded as bytes."""
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class DecodeTestCase(SimpleTestCase):
+    """Test suite for decoding uploaded images."""
+
+    def setUp(self):
+        """Create a 3000x2250 JPEG."""
+        self.jpeg_data = encode(make_test_image(6.75))
+
+    def test_open_full_resolution(self):
+        """Test images are opened at full size by default."""
+        self.assertEqual(decode_image(self.jpeg_data).size, (3000, 2250))
+
+    def test_open_proxy_uses_jpeg_draft(self):
+        """Test proxies are decoded at reduced scale and fit the long edge."""
+        jpeg_draft = JpegImagePlugin.JpegImageFile.draft
+        with patch.object(JpegImagePlugin.JpegImageFile, 'draft', autospec=True, side_effect=jpeg_draft) as draft:
+            img = decode_image(self.jpeg_data, max_edge=1280)
+        self.assertEqual(img.size, (1280, 960))
+        draft.assert_called()
+
+    def test_small_images_are_not_resized(self):
+        """Test images already within the long edge keep their size."""
+        data = encode(make_test_image(0.3), format='PNG')
+        self.assertEqual(decode_image(data, max_edge=1280).size, make_test_image(0.3).size)
+
+    def test_rejects_images_over_pixel_budget_before_decoding(self):
+        """Test oversized images are rejected from the header alone."""
+        with patch.object(ImageFile.ImageFile, 'load') as load:
+            with self.assertRaises(ImageTooLargeError):
+                decode_image(self.jpeg_data, max_pixels=5_000_000)
+        load.assert_not_called()
+
+    def test_applies_exif_orientation(self):
+        """Test photos tagged as rotated come out upright."""
+        image = Image.new('RGB', (40, 20), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees clockwise
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        self.assertEqual(decode_image(buffer.getvalue()).size, (20, 40))
+
+    def test_normalizes_modes_to_rgb(self):
+        """Test every input mode is decoded to RGB."""
+        transparent = Image.new('RGBA', (8, 8), (255, 0, 0, 0))
+        sixteen_bit = Image.new('I;16', (8, 8), 65535)
+        cases = {
+            'P': (make_test_image(0.01, 'P'), 'PNG', None),
+            'L': (Image.new('L', (8, 8), 100), 'PNG', (100, 100, 100)),
+            'LA': (Image.new('LA', (8, 8), (100, 255)), 'PNG', (100, 100, 100)),
+            'RGBA': (transparent, 'PNG', (255, 255, 255)),
+            'CMYK': (Image.new('CMYK', (8, 8), (0, 0, 0, 0)), 'TIFF', (255, 255, 255)),
+            'I;16': (sixteen_bit, 'PNG', (255, 255, 255)),
+        }
+        for mode, (image, format, pixel) in cases.items():
+            with self.subTest(mode=mode):
+                result = decode_image(encode(image, format=format))
+                self.assertEqual(result.mode, 'RGB')
+                if pixel is not None:
+                    self.assertEqual(result.getpixel((0, 0)), pixel)
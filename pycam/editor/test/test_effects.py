@@ -0,0 +1,164 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from PIL import Image, ImageChops, ImageEnhance, ImageOps
+
+from editor.benchmarks import make_test_image, legacy_apply_sepia
+from editor.effects import (
+    apply_effect, apply_pipeline, apply_curves, apply_sepia, apply_vignette,
+    intensity_to_params, resolve_params, precompute_curves, EffectParameterError,
+    _blend_curve, _build_vignette_mask, VIGNETTE_MASK_CACHE
+)
+
+
+def legacy_apply_vintage(image):
+    """Original split/enhance/merge vintage effect."""
+    r, g, b = image.split()
+    r = ImageEnhance.Brightness(ImageEnhance.Contrast(r).enhance(1.1)).enhance(1.1)
+    g = ImageEnhance.Brightness(ImageEnhance.Contrast(g).enhance(0.9)).enhance(0.9)
+    b = ImageEnhance.Brightness(ImageEnhance.Contrast(b).enhance(0.9)).enhance(0.8)
+    return Image.merge('RGB', (r, g, b))
+
+
+class EffectsTestCase(SimpleTestCase):
+    """Test suite for the image effects."""
+
+    def setUp(self):
+        """Create a small test photo."""
+        self.image = make_test_image(0.01)
+
+    def assertImagesClose(self, first, second, tolerance=1):
+        """Assert two images match in size and mode, within `tolerance` per channel."""
+        self.assertEqual(first.size, second.size)
+        self.assertEqual(first.mode, second.mode)
+        diff = ImageChops.difference(first, second)
+        self.assertLessEqual(max(high for _, high in diff.getextrema()), tolerance)
+
+    def test_sepia_matches_legacy(self):
+        """Test the lookup-table sepia matches the per-pixel version."""
+        self.assertImagesClose(apply_sepia(self.image), legacy_apply_sepia(self.image), tolerance=0)
+
+    def test_vignette_mask_matches_formula(self):
+        """Test the vectorized mask matches the per-pixel radial formula."""
+        width, height, level = 40, 30, 0.3
+        mask = _build_vignette_mask(width, height, level)
+        for x, y in [(0, 0), (20, 15), (39, 29), (10, 25), (33, 4)]:
+            distance = ((x - width / 2) ** 2 + (y - height / 2) ** 2) ** 0.5
+            distance = min(1.0, distance / (min(width, height) / 2))
+            self.assertAlmostEqual(mask.getpixel((x, y)), int(255 * (1 - distance * level)), delta=1)
+
+    def test_vignette_darkens_corners(self):
+        """Test the vignette darkens the edges and keeps the center."""
+        image = Image.new('RGB', (60, 40), (200, 200, 200))
+        result = apply_vignette(image)
+        self.assertEqual(result.mode, 'RGB')
+        self.assertEqual(result.getpixel((30, 20)), (200, 200, 200))
+        self.assertLess(result.getpixel((0, 0))[0], 200)
+
+    def test_vignette_mask_is_cached(self):
+        """Test a repeated vignette reuses the cached mask."""
+        VIGNETTE_MASK_CACHE.clear()
+        image = Image.new('RGB', (64, 48), 'white')
+        with patch('editor.effects._build_vignette_mask', wraps=_build_vignette_mask) as build:
+            apply_vignette(image)
+            apply_vignette(image)
+        build.assert_called_once_with(64, 48, 0.3)
+        self.assertEqual(VIGNETTE_MASK_CACHE.hits, 1)
+
+    def test_point_effects_match_pillow(self):
+        """Test the tone-curve effects match the Pillow operations they replace."""
+        image = self.image
+        r, g, b = image.split()
+        expected = {
+            'brightness': ImageEnhance.Brightness(image).enhance(1.5),
+            'contrast': ImageEnhance.Contrast(image).enhance(1.5),
+            'invert': ImageOps.invert(image),
+            'solarize': ImageOps.solarize(image, threshold=128),
+            'posterize': ImageOps.posterize(image, 2),
+            'vintage': legacy_apply_vintage(image),
+            'cool': Image.merge('RGB', (r, g, ImageEnhance.Brightness(b).enhance(1.2))),
+            'warm': Image.merge('RGB', (ImageEnhance.Brightness(r).enhance(1.2),
+                                        ImageEnhance.Brightness(g).enhance(1.1), b)),
+        }
+        for effect_name, expected_image in expected.items():
+            with self.subTest(effect=effect_name):
+                self.assertImagesClose(apply_effect(image, effect_name), expected_image)
+
+    def test_pipeline_matches_sequential_effects(self):
+        """Test a fused pipeline gives the same result as applying each effect."""
+        steps = ['warm', ('contrast', {'factor': 1.2}), 'blur', {'effect': 'brightness', 'factor': 0.9}, 'vintage']
+        expected = self.image
+        for effect_name, params in [('warm', {}), ('contrast', {'factor': 1.2}), ('blur', {}),
+                                    ('brightness', {'factor': 0.9}), ('vintage', {})]:
+            expected = apply_effect(expected, effect_name, **params)
+        self.assertImagesClose(apply_pipeline(self.image, steps), expected)
+
+    def test_pipeline_fuses_point_operations(self):
+        """Test a run of point operations is applied in a single pass."""
+        with patch('editor.effects.apply_curves', wraps=apply_curves) as curves:
+            apply_pipeline(self.image, ['warm', 'contrast', 'invert', 'solarize', 'posterize'])
+        curves.assert_called_once()
+
+        with patch('editor.effects.apply_curves', wraps=apply_curves) as curves:
+            apply_pipeline(self.image, ['warm', 'contrast', 'emboss', 'invert', 'cool'])
+        self.assertEqual(curves.call_count, 2)
+
+    def test_pipeline_checkpoints_between_stages(self):
+        """Test the checkpoint runs before each separate stage and can stop the render."""
+        calls = []
+        apply_pipeline(self.image, ['warm', 'blur', 'contrast', 'emboss'], checkpoint=lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+
+        def cancel():
+            raise RuntimeError('cancelled')
+        with patch('editor.effects.apply_effect', wraps=apply_effect) as effect:
+            with self.assertRaises(RuntimeError):
+                apply_pipeline(self.image, ['blur', 'emboss'], checkpoint=cancel)
+        effect.assert_not_called()
+
+    def test_intensity_midpoint_gives_defaults(self):
+        """Test the slider's default position maps to each effect's defaults."""
+        self.assertEqual(intensity_to_params('brightness', 50), {'factor': 1.5})
+        self.assertEqual(intensity_to_params('contrast', '50'), {'factor': 1.5})
+        self.assertEqual(intensity_to_params('blur', 50), {'radius': 2.0})
+        self.assertEqual(intensity_to_params('posterize', 50), {'bits': 2})
+        self.assertEqual(intensity_to_params('solarize', 50), {'threshold': 128})
+        self.assertEqual(intensity_to_params('grayscale', 50), {})
+
+    def test_intensity_is_quantized(self):
+        """Test nearby slider positions share the same parameters."""
+        self.assertEqual(intensity_to_params('brightness', 61), intensity_to_params('brightness', 59))
+        self.assertNotEqual(intensity_to_params('brightness', 60), intensity_to_params('brightness', 65))
+
+    def test_resolve_params_validates_ranges(self):
+        """Test explicit parameters are converted and range checked."""
+        self.assertEqual(resolve_params('posterize', {'bits': '4'}), {'bits': 4})
+        self.assertEqual(resolve_params('contrast', {'factor': '0.8'}, intensity=90), {'factor': 0.8})
+        with self.assertRaises(EffectParameterError):
+            resolve_params('posterize', {'bits': 12})
+        with self.assertRaises(EffectParameterError):
+            resolve_params('blur', {'factor': 1.0})
+        with self.assertRaises(EffectParameterError):
+            resolve_params('brightness', intensity=150)
+
+    def test_slider_curves_are_memoized(self):
+        """Test precomputed slider steps are served from the curve cache."""
+        precompute_curves()
+        before = _blend_curve.cache_info()
+        for intensity in (40, 45, 50, 45, 40):
+            apply_effect(self.image, 'brightness', **intensity_to_params('brightness', intensity))
+        after = _blend_curve.cache_info()
+        self.assertEqual(after.misses, before.misses)
+        self.assertEqual(after.hits - before.hits, 5)
+
+    def test_cartoon_flattens_colors_and_inks_edges(self):
+        """Test cartoon output uses a small palette plus black outlines."""
+        image = make_test_image(0.3)
+        result = apply_effect(image, 'cartoon')
+
+        self.assertEqual(result.mode, 'RGB')
+        self.assertEqual(result.size, image.size)
+        colors = result.getcolors(maxcolors=256)
+        self.assertIsNotNone(colors)
+        self.assertLessEqual(len(colors), 9)
+        self.assertIn((0, 0, 0), [color for _, color in colors])
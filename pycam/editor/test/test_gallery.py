@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from editor import gallery
+from editor.models import ImageEdit
+
+
+class GalleryTestCase(TestCase):
+    """Test suite for the paginated gallery."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        other = User.objects.create_user(username='other', password='otherpassword')
+        ImageEdit.objects.create(user=other, original_image='other.png', edited_image='other.png')
+
+        # Seven images, three of them saved in the same instant
+        now = timezone.now()
+        for minutes in [0, 1, 1, 1, 2, 3, 4]:
+            image_edit = ImageEdit.objects.create(user=self.user, original_image='a.png', edited_image='a.png')
+            ImageEdit.objects.filter(id=image_edit.id).update(created_at=now - timedelta(minutes=minutes))
+        self.expected = list(ImageEdit.objects.filter(user=self.user).order_by('-created_at', '-id')
+                             .values_list('id', flat=True))
+
+    def test_pages_cover_every_image_once(self):
+        """Test paging by cursor returns each image once, in order, across equal timestamps."""
+        seen = []
+        page, cursor = gallery.get_gallery_page(self.user, limit=3)
+        seen += [image.id for image in page]
+        while cursor:
+            page, cursor = gallery.get_gallery_page(self.user, cursor, limit=3)
+            seen += [image.id for image in page]
+        self.assertEqual(seen, self.expected)
+
+    def test_only_gallery_columns_are_loaded(self):
+        """Test the page query leaves out columns the gallery doesn't show."""
+        page, _ = gallery.get_gallery_page(self.user, limit=2)
+        self.assertEqual(page[0].get_deferred_fields(), {'original_image', 'updated_at'})
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors are rejected."""
+        for cursor in ['nonsense', 'bm9uc2Vuc2U', gallery.encode_cursor(ImageEdit(id=1, created_at=timezone.now()))[:-4]]:
+            with self.assertRaises(ValueError):
+                gallery.decode_cursor(cursor)
+
+    @override_settings(GALLERY_PAGE_SIZE=4)
+    def test_gallery_api(self):
+        """Test the gallery API returns pages with their next cursor and rendered cards."""
+        self.client.login(username='testuser', password='testpassword')
+
+        response = self.client.get(reverse('gallery_images'))
+        data = response.json()
+        self.assertEqual([image['id'] for image in data['images']], self.expected[:4])
+        self.assertEqual(data['html'].count('class="gallery-item"'), 4)
+
+        response = self.client.get(reverse('gallery_images'), {'cursor': data['next_cursor']})
+        data = response.json()
+        self.assertEqual([image['id'] for image in data['images']], self.expected[4:])
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get(reverse('gallery_images'), {'cursor': 'nonsense'})
+        self.assertEqual(response.json()['status'], 'error')
+
+    @override_settings(GALLERY_PAGE_SIZE=4)
+    def test_homepage_renders_first_page(self):
+        """Test the homepage renders one page and a cursor for the next."""
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.get(reverse('home'))
+        self.assertEqual([image.id for image in response.context['images']], self.expected[:4])
+        self.assertContains(response, f'data-next-cursor="{response.context["next_cursor"]}"')
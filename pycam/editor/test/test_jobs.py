@@ -0,0 +1,109 @@
+import base64
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from editor import jobs
+from editor.models import EffectJob
+from editor.test.test_decode import encode
+
+
+class EffectJobsTestCase(TestCase):
+    """Test suite for the effect job queue."""
+
+    def setUp(self):
+        """Create a user and a small red PNG."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.image_data = encode(PILImage.new('RGB', (40, 30), 'red'), format='PNG')
+
+    def test_claim_and_run_apply_job(self):
+        """Test a queued job is claimed once, rendered and stores its result."""
+        job = jobs.enqueue_apply(self.user, self.image_data, 'png', 'invert')
+
+        claimed = jobs.claim_next_job('worker-1')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, EffectJob.STATUS_RUNNING)
+        self.assertIsNone(jobs.claim_next_job('worker-2'))
+
+        jobs.run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress), (EffectJob.STATUS_DONE, 100))
+        self.assertIsNone(job.input_data)
+        result = PILImage.open(BytesIO(bytes(job.result_data)))
+        self.assertEqual(result.getpixel((0, 0)), (0, 255, 255))
+
+    def test_failed_job_records_error(self):
+        """Test a job whose input can't be decoded ends up failed with a message."""
+        jobs.enqueue_apply(self.user, b'not an image', 'png', 'invert')
+        job = jobs.run_job(jobs.claim_next_job('worker-1'))
+        self.assertEqual(job.status, EffectJob.STATUS_FAILED)
+        self.assertTrue(job.error)
+
+    def test_stale_jobs_are_requeued(self):
+        """Test jobs left running by a dead worker go back in the queue."""
+        jobs.enqueue_apply(self.user, self.image_data, 'png', 'invert')
+        job = jobs.claim_next_job('worker-1')
+        EffectJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale_jobs(), 1)
+        self.assertEqual(jobs.claim_next_job('worker-2').id, job.id)
+
+    def test_stale_jobs_fail_after_max_attempts(self):
+        """Test a job whose workers keep dying stops being requeued."""
+        jobs.enqueue_apply(self.user, self.image_data, 'png', 'invert')
+
+        with self.settings(EFFECT_JOB_MAX_ATTEMPTS=2):
+            for attempt in [1, 2]:
+                job = jobs.claim_next_job(f'worker-{attempt}')
+                self.assertEqual(job.attempts, attempt)
+                EffectJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(hours=1))
+                self.assertEqual(jobs.requeue_stale_jobs(), 1 if attempt < 2 else 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, EffectJob.STATUS_FAILED)
+        self.assertTrue(job.error)
+        self.assertIsNone(job.input_data)
+        self.assertIsNone(jobs.claim_next_job('worker-3'))
+
+    def test_async_apply_effect_end_to_end(self):
+        """Test job mode returns at once and the worker's result can be fetched."""
+        self.client.login(username='testuser', password='testpassword')
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image': 'data:image/png;base64,' + base64.b64encode(self.image_data).decode(),
+                  'async': '1'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 202)
+        queued = json.loads(response.content)
+        self.assertEqual(json.loads(self.client.get(queued['status_url']).content)['status'], 'queued')
+
+        call_command('run_effect_worker', '--once', stdout=StringIO())
+
+        status = json.loads(self.client.get(queued['status_url']).content)
+        self.assertEqual((status['status'], status['progress']), ('done', 100))
+        result = self.client.get(status['result_url'], HTTP_ACCEPT='image/*')
+        self.assertEqual(result['Content-Type'], 'image/png')
+        self.assertEqual(PILImage.open(BytesIO(result.content)).getpixel((0, 0)), (0, 255, 255))
+
+    def test_jobs_are_private(self):
+        """Test users can't see each other's jobs."""
+        job = jobs.enqueue_apply(self.user, self.image_data, 'png', 'invert')
+        User.objects.create_user(username='other', password='otherpassword')
+        self.client.login(username='other', password='otherpassword')
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.id])).status_code, 404)
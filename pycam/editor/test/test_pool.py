@@ -0,0 +1,106 @@
+import base64
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from editor import pool, renditions, result_cache
+from editor.models import ImageEdit
+from editor.benchmarks import make_test_image
+from editor.test.test_decode import encode
+
+
+def fail():
+    raise ValueError('broken effect')
+
+
+@override_settings(EFFECT_POOL_WORKERS=1)
+class EffectPoolTestCase(SimpleTestCase):
+    """Test suite for the effect process pool and its metrics."""
+
+    def setUp(self):
+        pool.shutdown_pool()
+        self.addCleanup(pool.shutdown_pool)
+
+    def test_physical_cores(self):
+        """Test the core count is at least one and never above the usable CPUs."""
+        self.assertGreaterEqual(pool.physical_cores(), 1)
+        self.assertLessEqual(pool.physical_cores(), os.cpu_count())
+
+    def test_stats_count_tasks(self):
+        """Test the queue depth goes back to zero and failures are counted."""
+        self.assertEqual(pool.run(abs, -3), 3)
+        with self.assertRaises(ValueError):
+            pool.run(fail)
+
+        stats = pool.get_stats()
+        self.assertEqual(stats['workers'], 1)
+        self.assertEqual((stats['depth'], stats['queued']), (0, 0))
+        self.assertEqual((stats['submitted'], stats['completed'], stats['failed']), (2, 2, 1))
+        self.assertGreaterEqual(stats['max_depth'], 1)
+
+    def test_workers_are_not_forked(self):
+        """Test pool processes don't start as forks of the (multithreaded) web worker."""
+        self.assertNotEqual(pool.START_METHOD, 'fork')
+        self.assertNotEqual(pool.run(os.getppid), os.getpid())
+
+    def test_workers_do_not_nest_pools(self):
+        """Test pool workers render in one piece instead of starting pools of their own."""
+        self.assertEqual(pool.run(pool.get_pool_size), 1)
+        self.assertFalse(pool.run(pool.offload_enabled))
+
+
+@override_settings(EFFECT_POOL_WORKERS=1, EFFECT_POOL_OFFLOAD=True)
+class OffloadTestCase(TestCase):
+    """Test suite for the views in split worker mode."""
+
+    def setUp(self):
+        pool.shutdown_pool()
+        self.addCleanup(pool.shutdown_pool)
+        result_cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        User.objects.create_user(username='testuser', password='testpassword')
+        self.client.login(username='testuser', password='testpassword')
+
+    def test_apply_effect_renders_in_pool(self):
+        """Test previews are rendered by the effect pool when offloading is on."""
+        data = encode(make_test_image(0.02), format='PNG')
+
+        response = self.client.post(reverse('apply_effect'), data={
+            'effect': 'grayscale',
+            'image': 'data:image/png;base64,' + base64.b64encode(data).decode('ascii'),
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(pool.get_stats()['completed'], 1)
+
+    def test_save_image_builds_renditions_in_pool(self):
+        """Test a save encodes its gallery renditions in the effect pool, not the request thread."""
+        data = encode(make_test_image(0.02), format='PNG')
+
+        with patch('editor.pool.run', wraps=pool.run) as mock_run:
+            response = self.client.post(reverse('save_image') + '?effect_applied=original', data=data,
+                                        content_type='image/png', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        image_edit = ImageEdit.objects.get(id=response.json()['image_id'])
+        self.assertEqual([call.args[0] for call in mock_run.call_args_list], [renditions.encode_renditions])
+        self.assertTrue(image_edit.renditions.exists())
+        for rendition in image_edit.renditions.all():
+            self.assertTrue(rendition.file.storage.exists(rendition.file.name))
+
+    def test_stats_view_is_staff_only(self):
+        """Test the queue depth endpoint needs a staff account."""
+        response = self.client.get(reverse('effect_pool_stats'))
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.filter(username='testuser').update(is_staff=True)
+        response = self.client.get(reverse('effect_pool_stats'))
+        self.assertEqual(response.json()['pid'], os.getpid())
@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase, override_settings
+
+from editor.benchmarks import make_test_image
+from editor.effects import EFFECTS
+from editor.pool import shutdown_pool
+from editor.previews import render_previews
+
+
+class PreviewsTestCase(SimpleTestCase):
+    """Test suite for the effect contact sheet."""
+
+    def test_renders_every_effect(self):
+        """Test one preview is rendered for every registered effect."""
+        previews = render_previews(make_test_image(0.02), parallel=False)
+        self.assertEqual(list(previews), list(EFFECTS))
+        self.assertTrue(all(data.startswith(b'\xff\xd8') for data in previews.values()))
+
+    @override_settings(EFFECT_POOL_WORKERS=2)
+    def test_parallel_matches_serial(self):
+        """Test rendering in the process pool gives the same previews."""
+        image = make_test_image(0.02)
+        effect_names = ['sepia', 'blur', 'cartoon']
+        params = {'blur': {'radius': 1.0}}
+        try:
+            parallel = render_previews(image, effect_names, params, parallel=True)
+        finally:
+            shutdown_pool()
+        self.assertEqual(parallel, render_previews(image, effect_names, params, parallel=False))
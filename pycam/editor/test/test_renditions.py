@@ -0,0 +1,119 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image as PILImage
+
+from editor.models import ImageEdit, ImageRendition
+from editor.renditions import generate_renditions, get_formats
+from editor.storage import blob_storage
+from editor.test.test_decode import encode
+
+
+class RenditionsTestCase(TestCase):
+    """Test suite for gallery renditions."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, FILE_CLEANUP_IN_BACKGROUND=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def create_edit(self, size):
+        """Save an image edit of the given size without renditions."""
+        data = encode(PILImage.new('RGB', size, color='red'), format='PNG')
+        image_edit = ImageEdit(user=self.user, effect_applied='original')
+        image_edit.original_image.save('original.png', ContentFile(data), save=False)
+        image_edit.edited_image.save('edited.png', ContentFile(data), save=False)
+        image_edit.save()
+        return image_edit
+
+    def test_generates_each_width_and_format(self):
+        """Test every width narrower than the image is made in each format, once."""
+        image_edit = self.create_edit((1500, 1000))
+
+        created = generate_renditions(image_edit)
+
+        renditions = image_edit.renditions.all()
+        self.assertEqual(len(created), 3 * len(get_formats()))
+        self.assertEqual(sorted({(r.width, r.height) for r in renditions}), [(320, 213), (640, 427), (1280, 853)])
+        self.assertEqual({r.format for r in renditions}, set(get_formats()))
+        with image_edit.renditions.get(width=640, format='jpeg').file.open() as f:
+            self.assertEqual(PILImage.open(f).size, (640, 427))
+        self.assertEqual(generate_renditions(image_edit), [])
+
+    def test_small_images_are_not_upscaled(self):
+        """Test an image narrower than every rendition gets one at its own width."""
+        image_edit = self.create_edit((200, 100))
+        generate_renditions(image_edit)
+        self.assertEqual(set(image_edit.renditions.values_list('width', flat=True)), {200})
+
+    def test_srcset(self):
+        """Test the srcset lists the renditions, or the view that makes them until they exist."""
+        image_edit = self.create_edit((1500, 1000))
+        lazy_url = reverse('image_rendition', args=[image_edit.id, 320, 'jpeg'])
+        self.assertIn(f'{lazy_url} 320w', image_edit.jpeg_srcset)
+
+        generate_renditions(image_edit)
+        image_edit = ImageEdit.objects.prefetch_related('renditions').get(id=image_edit.id)
+        small = image_edit.renditions.get(width=320, format='jpeg')
+        self.assertTrue(image_edit.jpeg_srcset.startswith(f'{small.file.url} 320w, '))
+        self.assertEqual(image_edit.jpeg_srcset.count('w, '), 2)
+
+    def test_rendition_view_generates_on_demand(self):
+        """Test existing images get their renditions the first time one is requested."""
+        image_edit = self.create_edit((1500, 1000))
+        self.client.login(username='testuser', password='testpassword')
+
+        response = self.client.get(reverse('image_rendition', args=[image_edit.id, 600, 'jpeg']))
+
+        rendition = image_edit.renditions.get(width=640, format='jpeg')
+        self.assertRedirects(response, rendition.file.url, fetch_redirect_response=False)
+
+        User.objects.create_user(username='other', password='otherpassword')
+        self.client.login(username='other', password='otherpassword')
+        response = self.client.get(reverse('image_rendition', args=[image_edit.id, 600, 'jpeg']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_saving_generates_renditions(self):
+        """Test a saved image gets its renditions straight away."""
+        self.client.login(username='testuser', password='testpassword')
+        data = encode(PILImage.new('RGB', (800, 600), color='red'), format='PNG')
+
+        response = self.client.post(
+            reverse('save_image') + '?effect_applied=original',
+            data=data,
+            content_type='image/png',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        image_edit = ImageEdit.objects.get(id=response.json()['image_id'])
+        self.assertEqual(set(image_edit.renditions.values_list('width', flat=True)), {320, 640, 800})
+
+    def test_backfill_command(self):
+        """Test the command creates renditions for images that have none."""
+        image_edit = self.create_edit((700, 500))
+        out = StringIO()
+        call_command('generate_renditions', stdout=out)
+        self.assertEqual(image_edit.renditions.count(), 3 * len(get_formats()))
+        self.assertIn('for 1 images', out.getvalue())
+
+    def test_rendition_files_are_released(self):
+        """Test deleting an image edit deletes the files of its renditions."""
+        image_edit = self.create_edit((700, 500))
+        generate_renditions(image_edit)
+        names = [r.file.name for r in image_edit.renditions.all()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image_edit.delete()
+
+        self.assertFalse(ImageRendition.objects.exists())
+        self.assertFalse(any(blob_storage.exists(name) for name in names))
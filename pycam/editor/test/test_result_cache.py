@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase, override_settings
+
+from editor import result_cache
+
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'effects': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'effects'},
+}
+
+
+class ResultCacheTestCase(SimpleTestCase):
+    """Test suite for the effect result cache."""
+
+    def setUp(self):
+        """Start every test with empty caches."""
+        result_cache.clear()
+        self.result = {'data': b'\x89PNG', 'format': 'png', 'width': 1, 'height': 1}
+
+    def test_key_depends_on_content_and_settings(self):
+        """Test keys change with the bytes, effect, params and options, but not param order."""
+        photo = result_cache.image_digest(b'photo')
+        key = result_cache.make_key(photo, 'contrast', {'factor': 1.2, 'x': 1}, max_edge=1280)
+        self.assertEqual(key, result_cache.make_key(photo, 'contrast', {'x': 1, 'factor': 1.2}, max_edge=1280))
+        self.assertNotEqual(key, result_cache.make_key(
+            result_cache.image_digest(b'photo!'), 'contrast', {'factor': 1.2, 'x': 1}, max_edge=1280))
+        self.assertNotEqual(key, result_cache.make_key(photo, 'contrast', {'factor': 1.3, 'x': 1}, max_edge=1280))
+        self.assertNotEqual(key, result_cache.make_key(photo, 'contrast', {'factor': 1.2, 'x': 1}, max_edge=None))
+
+    def test_local_layer_counts_hits_and_misses(self):
+        """Test the in-process layer works without a shared cache."""
+        self.assertIsNone(result_cache.get_result('key'))
+        result_cache.set_result('key', self.result)
+        self.assertEqual(result_cache.get_result('key'), self.result)
+
+        stats = result_cache.get_stats()
+        self.assertEqual((stats['local']['hits'], stats['local']['misses']), (1, 1))
+        self.assertFalse(stats['shared']['enabled'])
+
+    @override_settings(CACHES=SHARED_CACHES, EFFECT_RESULT_CACHE_ALIAS='effects')
+    def test_shared_layer_serves_other_workers(self):
+        """Test a result stored by one worker is found by another through the shared cache."""
+        result_cache.set_result('key', self.result)
+        # Another worker starts with an empty local layer
+        result_cache.LOCAL_CACHE.clear()
+
+        self.assertEqual(result_cache.get_result('key'), self.result)
+        self.assertIn('key', result_cache.LOCAL_CACHE)
+        self.assertEqual(result_cache.get_stats()['shared']['hits'], 1)
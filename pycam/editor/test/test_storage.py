@@ -0,0 +1,83 @@
+import hashlib
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, override_settings
+from PIL import Image as PILImage
+
+from editor import rendering
+from editor.models import ImageEdit, StoredFile, release_files
+from editor.storage import blob_storage
+from editor.test.test_decode import encode
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    """Test suite for content-addressed image storage."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, FILE_CLEANUP_IN_BACKGROUND=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def test_names_are_sharded_by_hash(self):
+        """Test files are named by the hash of their contents under two levels of directories."""
+        digest = hashlib.sha256(b'photo').hexdigest()
+        name = blob_storage.save('original_1.PNG', ContentFile(b'photo'))
+        self.assertEqual(name, f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.png')
+
+    def test_identical_content_is_stored_once(self):
+        """Test saving the same bytes twice reuses the stored file without writing it again."""
+        first = blob_storage.save('original_1.png', ContentFile(b'photo'))
+        with patch.object(FileSystemStorage, '_save') as mock_save:
+            second = blob_storage.save('edited_1.png', ContentFile(b'photo'))
+
+        self.assertEqual(first, second)
+        mock_save.assert_not_called()
+        self.assertNotEqual(blob_storage.save('edited_2.png', ContentFile(b'other')), first)
+
+    def test_files_are_deleted_with_their_last_reference(self):
+        """Test a shared file is kept until no image edit refers to it."""
+        def create_edit(original, edited):
+            image_edit = ImageEdit(user=self.user, effect_applied='invert')
+            image_edit.original_image.save('original.png', ContentFile(original), save=False)
+            image_edit.edited_image.save('edited.png', ContentFile(edited), save=False)
+            image_edit.save()
+            return image_edit
+
+        first = create_edit(b'photo', b'photo')
+        second = create_edit(b'photo', b'inverted')
+        shared, inverted = second.original_image.name, second.edited_image.name
+        self.assertEqual(first.original_image.name, first.edited_image.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(blob_storage.exists(shared))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(blob_storage.exists(shared))
+        self.assertFalse(blob_storage.exists(inverted))
+
+    def test_save_restores_files_released_before_commit(self):
+        """Test a file deleted by a concurrent release before the new row commits is written again."""
+        data = encode(PILImage.new('RGB', (40, 30), color='red'), format='PNG')
+        real_build = rendering.build_renditions
+
+        def build_then_release(edited_data):
+            # Another request drops the last image using this photo meanwhile
+            release_files(blob_storage.save('x.png', ContentFile(data)))
+            return real_build(edited_data)
+
+        with patch('editor.rendering.build_renditions', side_effect=build_then_release):
+            image_edit = rendering.store_edit(self.user, 'original', 'original.png', data, 'edited.png', data)
+
+        self.assertTrue(blob_storage.exists(image_edit.original_image.name))
+        self.assertTrue(StoredFile.objects.filter(name=image_edit.original_image.name).exists())
@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from PIL import ImageChops
+
+from editor.benchmarks import make_test_image
+from editor.effects import apply_effect
+from editor.pool import shutdown_pool
+from editor.tiling import apply_tiled, should_tile
+
+
+class TilingTestCase(SimpleTestCase):
+    """Test suite for tiled effect execution."""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdown_pool()
+        super().tearDownClass()
+
+    def setUp(self):
+        """Create a tall test photo so it splits into several strips."""
+        self.image = make_test_image(0.3).resize((400, 700))
+
+    def test_tiled_matches_single_threaded(self):
+        """Test tiled kernel filters leave no seams."""
+        cases = [
+            ('blur', {}), ('blur', {'radius': 5}), ('emboss', {}), ('contour', {}),
+            ('sharpen', {}), ('edge_enhance', {}), ('sepia', {}), ('warm', {}),
+        ]
+        for effect_name, params in cases:
+            with self.subTest(effect=effect_name, **params):
+                expected = apply_effect(self.image, effect_name, tiled=False, **params)
+                result = apply_tiled(self.image, effect_name, params, tiles=4)
+                self.assertEqual(result.size, expected.size)
+                self.assertIsNone(ImageChops.difference(result, expected).getbbox())
+
+    def test_whole_image_effects_are_not_tiled(self):
+        """Test effects that depend on the whole image run in one piece."""
+        with patch('editor.tiling.apply_tiled') as tiled:
+            apply_effect(self.image, 'contrast', tiled=True)
+            apply_effect(self.image, 'vignette', tiled=True)
+        tiled.assert_not_called()
+
+    @override_settings(EFFECT_TILE_MIN_PIXELS=100_000, EFFECT_POOL_WORKERS=4)
+    def test_should_tile_uses_size_threshold(self):
+        """Test only images above the size threshold are tiled."""
+        self.assertTrue(should_tile(self.image, 'blur'))
+        self.assertFalse(should_tile(self.image.resize((200, 200)), 'blur'))
+        self.assertFalse(should_tile(self.image, 'cartoon'))
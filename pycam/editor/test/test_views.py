@@ -1,16 +1,20 @@
 import os
 import base64
 import json
-from io import BytesIO
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 from unittest.mock import patch, MagicMock
 
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
+from django.core.management import call_command
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.messages.storage.fallback import FallbackStorage
 from PIL import Image as PILImage
 
+from editor import result_cache, working_images
 from editor.models import ImageEdit
 from editor.views import (
     login, homepage, apply_image_effect, save_image,
@@ -23,6 +27,13 @@ class EditorViewsTestCase(TestCase):
 
     def setUp(self):
         """Set up test environment."""
+        # Saved images go to a temporary directory, not the project's media
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
         # Create test user
         self.username = 'testuser'
         self.password = 'testpassword'
@@ -31,6 +42,9 @@ class EditorViewsTestCase(TestCase):
             password=self.password
         )
 
+        # Every test renders from scratch
+        result_cache.clear()
+
         # Set up client and factory
         self.client = Client()
         self.factory = RequestFactory()
@@ -142,6 +156,476 @@ class EditorViewsTestCase(TestCase):
         # Verify the mock was called
         mock_apply_effect.assert_called_once()
 
+    def test_apply_image_effect_pipeline(self):
+        """Test applying a chain of effects in one request."""
+        self.client.login(username=self.username, password=self.password)
+
+        data = {
+            'image': self.base64_image,
+            'pipeline': json.dumps(['invert', {'effect': 'brightness', 'factor': 0.5}]),
+        }
+        response = self.client.post(
+            reverse('apply_effect'),
+            data=data,
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertEqual(response_data['effect'], 'invert+brightness')
+
+        # Red inverted to cyan, then darkened by half
+        img_data = base64.b64decode(response_data['image'].split(';base64,')[1])
+        self.assertEqual(PILImage.open(BytesIO(img_data)).getpixel((0, 0)), (0, 127, 127))
+
+    def test_apply_image_effect_intensity(self):
+        """Test the intensity slider controls the effect strength."""
+        self.client.login(username=self.username, password=self.password)
+
+        data = {'effect': 'brightness', 'image': self.base64_image, 'intensity': 0}
+        response = self.client.post(
+            reverse('apply_effect'),
+            data=data,
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertEqual(response_data['params'], {'factor': 0.5})
+        img_data = base64.b64decode(response_data['image'].split(';base64,')[1])
+        self.assertEqual(PILImage.open(BytesIO(img_data)).getpixel((0, 0)), (127, 0, 0))
+
+    def test_apply_image_effect_invalid_param(self):
+        """Test out-of-range effect parameters are rejected."""
+        self.client.login(username=self.username, password=self.password)
+
+        data = {'effect': 'posterize', 'image': self.base64_image, 'bits': 9}
+        response = self.client.post(
+            reverse('apply_effect'),
+            data=data,
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'error')
+        self.assertIn('bits', response_data['message'])
+
+    def test_apply_image_effect_preview_proxy(self):
+        """Test previews are rendered on a downsized proxy unless preview=0."""
+        self.client.login(username=self.username, password=self.password)
+
+        buffer = BytesIO()
+        PILImage.new('RGB', (2560, 1920), color='red').save(buffer, format='JPEG')
+        image_data = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+        for preview, size in (('1', (1280, 960)), ('0', (2560, 1920))):
+            response = self.client.post(
+                reverse('apply_effect'),
+                data={'effect': 'invert', 'image': image_data, 'preview': preview},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+            response_data = json.loads(response.content)
+            self.assertEqual(response_data['status'], 'success')
+            self.assertEqual((response_data['width'], response_data['height']), size)
+
+    def test_apply_image_effect_cached(self):
+        """Test repeating a request is served from the result cache."""
+        self.client.login(username=self.username, password=self.password)
+
+        data = {'effect': 'sepia', 'image': self.base64_image}
+        first = json.loads(self.client.post(
+            reverse('apply_effect'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest').content)
+        with patch('editor.views.apply_effect') as mock_apply_effect, \
+                patch('editor.result_cache.image_digest', wraps=result_cache.image_digest) as mock_digest:
+            second = json.loads(self.client.post(
+                reverse('apply_effect'), data=data, HTTP_X_REQUESTED_WITH='XMLHttpRequest').content)
+        mock_apply_effect.assert_not_called()
+        # One hash of the photo serves both the cache key and the render token
+        mock_digest.assert_called_once()
+        self.assertTrue(second['render_token'])
+
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(first['image'], second['image'])
+        self.assertEqual(result_cache.get_stats()['local']['hits'], 1)
+
+    def test_effect_previews(self):
+        """Test every effect preview is returned from one request."""
+        self.client.login(username=self.username, password=self.password)
+
+        buffer = BytesIO()
+        PILImage.new('RGB', (1600, 1200), color='red').save(buffer, format='JPEG')
+        image_data = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('utf-8')
+        response = self.client.post(
+            reverse('effect_previews'),
+            data={'image': image_data},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertEqual((response_data['width'], response_data['height']), (160, 120))
+        self.assertIn('sepia', response_data['previews'])
+        self.assertIn('cartoon', response_data['previews'])
+        preview = base64.b64decode(response_data['previews']['invert'].split(';base64,')[1])
+        self.assertEqual(PILImage.open(BytesIO(preview)).size, (160, 120))
+
+    def test_effect_previews_unknown_effect(self):
+        """Test requesting previews of unknown effects is rejected."""
+        self.client.login(username=self.username, password=self.password)
+
+        response = self.client.post(
+            reverse('effect_previews'),
+            data={'image': self.base64_image, 'effects': 'sepia,sparkle'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'error')
+        self.assertIn('sparkle', response_data['message'])
+
+    def upload_working_image(self):
+        """Upload the test image as a working image and return its ID."""
+        self.img_buffer.seek(0)
+        upload = SimpleUploadedFile('photo.png', self.img_buffer.read(), content_type='image/png')
+        response = self.client.post(
+            reverse('upload_working_image'),
+            data={'image': upload},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertEqual((response_data['width'], response_data['height']), (100, 100))
+        return response_data['image_id']
+
+    def test_apply_image_effect_by_working_image_id(self):
+        """Test effects can be applied to an uploaded working image by ID."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image_id': image_id},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertIn('data:image/png;base64,', response_data['image'])
+        img_data = base64.b64decode(response_data['image'].split(';base64,')[1])
+        self.assertEqual(PILImage.open(BytesIO(img_data)).getpixel((0, 0)), (0, 255, 255))
+
+    def test_working_image_is_private(self):
+        """Test another user can't use someone else's working image."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        User.objects.create_user(username='other', password='otherpassword')
+        self.client.login(username='other', password='otherpassword')
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image_id': image_id},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(json.loads(response.content)['status'], 'error')
+
+    def test_save_image_by_working_image_id(self):
+        """Test saving renders the effect on the stored original."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        response = self.client.post(
+            reverse('save_image'),
+            data={'image_id': image_id, 'effect_applied': 'invert'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertTrue(response_data['success'])
+        image_edit = ImageEdit.objects.get(id=response_data['image_id'])
+        with image_edit.original_image.open() as original, image_edit.edited_image.open() as edited:
+            self.assertEqual(PILImage.open(original).getpixel((0, 0)), (255, 0, 0))
+            self.assertEqual(PILImage.open(edited).getpixel((0, 0)), (0, 255, 255))
+
+    def test_save_image_reuses_previewed_render(self):
+        """Test saving with a render token stores the previewed bytes without rendering again."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image_id': image_id},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_ACCEPT='image/*'
+        )
+        render_token = response['X-Render-Token']
+
+        with patch('editor.rendering.render') as mock_render:
+            response = self.client.post(
+                reverse('save_image'),
+                data={'image_id': image_id, 'effect_applied': 'invert', 'render_token': render_token},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+        mock_render.assert_not_called()
+
+        image_edit = ImageEdit.objects.get(id=json.loads(response.content)['image_id'])
+        with image_edit.edited_image.open() as edited:
+            self.assertEqual(PILImage.open(edited).getpixel((0, 0)), (0, 255, 255))
+
+    def test_save_image_render_token_mismatch(self):
+        """Test a render token for other settings or an expired render falls back to rendering."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'brightness', 'intensity': 0, 'image_id': image_id},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        render_token = json.loads(response.content)['render_token']
+
+        # Different settings than the preview
+        response = self.client.post(
+            reverse('save_image'),
+            data={'image_id': image_id, 'effect_applied': 'brightness', 'render_token': render_token},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        image_edit = ImageEdit.objects.get(id=json.loads(response.content)['image_id'])
+        with image_edit.edited_image.open() as edited:
+            self.assertEqual(PILImage.open(edited).getpixel((0, 0)), (255, 0, 0))
+
+        # The render is no longer cached
+        result_cache.clear()
+        response = self.client.post(
+            reverse('save_image'),
+            data={'image_id': image_id, 'effect_applied': 'brightness', 'intensity': 0,
+                  'render_token': render_token},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        image_edit = ImageEdit.objects.get(id=json.loads(response.content)['image_id'])
+        with image_edit.edited_image.open() as edited:
+            self.assertEqual(PILImage.open(edited).getpixel((0, 0)), (127, 0, 0))
+
+    def test_save_image_form_render_token_is_bound_to_photo(self):
+        """Test a form save only reuses a render of the same photo."""
+        self.client.login(username=self.username, password=self.password)
+
+        def png(color):
+            buffer = BytesIO()
+            PILImage.new('RGB', (50, 50), color=color).save(buffer, format='PNG')
+            return buffer.getvalue()
+
+        red, green = png('red'), png('green')
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image': 'data:image/png;base64,' + base64.b64encode(red).decode()},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        render_token = json.loads(response.content)['render_token']
+
+        def save(data):
+            self.client.post(reverse('save_image'), data={
+                'original_image': SimpleUploadedFile('photo.png', data, content_type='image/png'),
+                'effect_applied': 'invert',
+                'render_token': render_token,
+            })
+            with ImageEdit.objects.latest('id').edited_image.open() as edited:
+                return PILImage.open(edited).getpixel((0, 0))
+
+        # Another photo is rendered, not given the preview of the first one
+        self.assertEqual(save(green), (255, 127, 255))
+        with patch('editor.views.apply_effect') as mock_apply_effect:
+            self.assertEqual(save(red), (0, 255, 255))
+        mock_apply_effect.assert_not_called()
+
+    def test_image_views_run_without_request_transaction(self):
+        """Test the image processing views opt out of ATOMIC_REQUESTS."""
+        for view in [apply_image_effect, save_image]:
+            self.assertEqual(view._non_atomic_requests, {'default'})
+
+    def test_save_image_failed_commit_removes_files(self):
+        """Test a save whose transaction fails leaves no files behind."""
+        self.client.login(username=self.username, password=self.password)
+        image_count_before = ImageEdit.objects.count()
+        img = PILImage.new('RGB', (50, 40), color='green')
+        buffer = BytesIO()
+        img.save(buffer, format='PNG')
+
+        with patch('editor.rendering.ImageRendition.objects.bulk_create', side_effect=RuntimeError('db down')), \
+                patch('editor.storage.ContentAddressedStorage.delete') as mock_delete:
+            response = self.client.post(
+                reverse('save_image') + '?effect_applied=original',
+                data=buffer.getvalue(),
+                content_type='image/png',
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+
+        self.assertFalse(json.loads(response.content)['success'])
+        self.assertEqual(ImageEdit.objects.count(), image_count_before)
+        # The original (also the edited copy) and each rendition
+        deleted = {call.args[0] for call in mock_delete.call_args_list}
+        self.assertTrue(any(name.endswith('.png') for name in deleted))
+        self.assertGreater(len(deleted), 1)
+
+    def test_apply_image_effect_binary(self):
+        """Test a multipart upload can get the raw image back with metadata in headers."""
+        self.client.login(username=self.username, password=self.password)
+
+        self.img_buffer.seek(0)
+        upload = SimpleUploadedFile('photo.png', self.img_buffer.read(), content_type='image/png')
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'brightness', 'intensity': 0, 'image': upload},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_ACCEPT='image/*'
+        )
+
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['X-Effect'], 'brightness')
+        self.assertEqual(json.loads(response['X-Effect-Params']), {'factor': 0.5})
+        self.assertEqual(response['X-Effect-Cache'], 'MISS')
+        self.assertEqual((response['X-Image-Width'], response['X-Image-Height']), ('100', '100'))
+        self.assertEqual(PILImage.open(BytesIO(response.content)).getpixel((0, 0)), (127, 0, 0))
+
+    def test_apply_image_effect_raw_body(self):
+        """Test an image/* request body takes its parameters from the query string."""
+        self.client.login(username=self.username, password=self.password)
+
+        self.img_buffer.seek(0)
+        response = self.client.post(
+            reverse('apply_effect') + '?effect=invert',
+            data=self.img_buffer.read(),
+            content_type='image/png',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        # JSON stays the default response
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        img_data = base64.b64decode(response_data['image'].split(';base64,')[1])
+        self.assertEqual(PILImage.open(BytesIO(img_data)).getpixel((0, 0)), (0, 255, 255))
+
+    def test_apply_image_effect_octet_stream_upload(self):
+        """Test the output format comes from the image bytes, not the upload's content type."""
+        self.client.login(username=self.username, password=self.password)
+
+        self.img_buffer.seek(0)
+        upload = SimpleUploadedFile('photo', self.img_buffer.read(), content_type='application/octet-stream')
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image': upload},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertTrue(response_data['image'].startswith('data:image/png;base64,'))
+
+    def test_apply_image_effect_jpg_data_url(self):
+        """Test a data URL with the non-standard image/jpg type is rendered as a JPEG."""
+        self.client.login(username=self.username, password=self.password)
+        buffer = BytesIO()
+        PILImage.new('RGB', (40, 30), color='red').save(buffer, format='JPEG')
+
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert',
+                  'image': f"data:image/jpg;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertEqual(response_data['status'], 'success')
+        self.assertTrue(response_data['image'].startswith('data:image/jpeg;base64,'))
+        img_data = base64.b64decode(response_data['image'].split(';base64,')[1])
+        self.assertEqual(PILImage.open(BytesIO(img_data)).format, 'JPEG')
+
+    def test_save_image_raw_body(self):
+        """Test the AJAX save accepts the edited image as a raw image/* body."""
+        self.client.login(username=self.username, password=self.password)
+
+        self.img_buffer.seek(0)
+        response = self.client.post(
+            reverse('save_image') + '?effect_applied=sepia',
+            data=self.img_buffer.read(),
+            content_type='image/png',
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        response_data = json.loads(response.content)
+        self.assertTrue(response_data['success'])
+        image_edit = ImageEdit.objects.get(id=response_data['image_id'])
+        self.assertEqual(image_edit.effect_applied, 'sepia')
+        self.assertTrue(image_edit.edited_image.name.endswith('.png'))
+
+    def test_save_image_async(self):
+        """Test a save can be queued and is completed by the effect worker."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        response = self.client.post(
+            reverse('save_image'),
+            data={'image_id': image_id, 'effect_applied': 'sepia', 'async': '1'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 202)
+        status_url = json.loads(response.content)['status_url']
+
+        call_command('run_effect_worker', '--once', stdout=StringIO())
+
+        status = json.loads(self.client.get(status_url).content)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(ImageEdit.objects.get(id=status['image_id']).effect_applied, 'sepia')
+
+    def test_apply_image_effect_stale_sequence_rejected(self):
+        """Test a request older than one already started for the image is dropped."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        for seq, expected in ((5, 200), (4, 409), (6, 200)):
+            response = self.client.post(
+                reverse('apply_effect'),
+                data={'effect': 'brightness', 'intensity': seq * 10, 'image_id': image_id, 'seq': seq},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+            self.assertEqual(response.status_code, expected)
+
+    def test_apply_image_effect_stops_when_superseded(self):
+        """Test a render abandons its work once a newer request starts."""
+        self.client.login(username=self.username, password=self.password)
+        image_id = self.upload_working_image()
+
+        def newer_request_arrives(img, effect_name, **params):
+            working_images.start_request(image_id, 2)
+            return img
+
+        with patch('editor.views.apply_effect', side_effect=newer_request_arrives):
+            response = self.client.post(
+                reverse('apply_effect'),
+                data={'effect': 'sepia', 'image_id': image_id, 'seq': 1},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content)['status'], 'superseded')
+        # Nothing was cached for the abandoned render
+        self.assertEqual(result_cache.get_stats()['local']['entries'], 0)
+
+    def test_apply_image_effect_draft(self):
+        """Test draft requests render on a smaller proxy than previews."""
+        self.client.login(username=self.username, password=self.password)
+
+        buffer = BytesIO()
+        PILImage.new('RGB', (1600, 1200), color='red').save(buffer, format='JPEG')
+        image_data = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('utf-8')
+        response = self.client.post(
+            reverse('apply_effect'),
+            data={'effect': 'invert', 'image': image_data, 'draft': '1'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        response_data = json.loads(response.content)
+        self.assertEqual((response_data['width'], response_data['height']), (480, 360))
+
     def test_apply_image_effect_missing_data(self):
         """Test applying an effect with missing data."""
         # Log in the user
@@ -286,6 +770,28 @@ class EditorViewsTestCase(TestCase):
         # Verify image was deleted
         self.assertFalse(ImageEdit.objects.filter(id=image_id).exists())
 
+    def test_bulk_delete_images(self):
+        """Test several images can be deleted in one request, only the user's own."""
+        self.client.login(username=self.username, password=self.password)
+        mine = [self.image_edit.id] + [
+            ImageEdit.objects.create(user=self.user, original_image='a.png', edited_image='a.png').id
+            for _ in range(2)]
+        other = User.objects.create_user(username='other', password='otherpassword')
+        theirs = ImageEdit.objects.create(user=other, original_image='b.png', edited_image='b.png').id
+
+        with patch('editor.models.cleanup.defer') as mock_defer:
+            response = self.client.post(
+                reverse('bulk_delete_images'),
+                data={'ids': mine + [theirs]},
+                HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+            )
+
+        self.assertEqual(json.loads(response.content), {'success': True, 'deleted': 3})
+        self.assertEqual(list(ImageEdit.objects.values_list('id', flat=True)), [theirs])
+        # One cleanup batch for all the files
+        mock_defer.assert_called_once()
+        self.assertIn('a.png', mock_defer.call_args.args[1:])
+
     def test_share_image(self):
         """Test sharing an image."""
         # Log in the user
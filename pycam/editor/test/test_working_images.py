@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from PIL import UnidentifiedImageError
+
+from editor import working_images
+from editor.decode import ImageTooLargeError
+from editor.test.test_decode import encode
+from editor.benchmarks import make_test_image
+
+WORKING_IMAGE_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'working_images': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'working'},
+}
+
+
+@override_settings(CACHES=WORKING_IMAGE_CACHES)
+class WorkingImagesTestCase(SimpleTestCase):
+    """Test suite for the working image store."""
+
+    def setUp(self):
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir)
+        settings_override = override_settings(EFFECT_WORKING_IMAGE_DIR=data_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_stores_original_bytes(self):
+        """Test the upload is kept byte for byte with its format and size."""
+        data = encode(make_test_image(0.01))
+        image_id, entry = working_images.create_working_image(data, user_id=1, filename='photo.jpg')
+
+        stored = working_images.get_working_image(image_id, user_id=1)
+        self.assertNotIn('data', stored)
+        self.assertEqual(working_images.read_working_image_data(image_id), data)
+        self.assertEqual(stored['format'], 'jpeg')
+        self.assertEqual((stored['width'], stored['height']), (115, 86))
+
+    def test_only_owner_can_use_or_delete(self):
+        """Test working images are private to the user who uploaded them."""
+        image_id, _ = working_images.create_working_image(encode(make_test_image(0.01)), user_id=1)
+        self.assertIsNone(working_images.get_working_image(image_id, user_id=2))
+        self.assertFalse(working_images.delete_working_image(image_id, user_id=2))
+        self.assertTrue(working_images.delete_working_image(image_id, user_id=1))
+        self.assertIsNone(working_images.get_working_image(image_id, user_id=1))
+
+    def test_lookups_only_rewrite_entries_near_expiry(self):
+        """Test using an image extends its life without rewriting the entry on every lookup."""
+        image_id, entry = working_images.create_working_image(encode(make_test_image(0.01)), user_id=1)
+        store = working_images.get_store()
+
+        with patch.object(store, 'set') as mock_set:
+            working_images.get_working_image(image_id, user_id=1)
+        mock_set.assert_not_called()
+
+        with patch('editor.working_images.time.time', return_value=entry['expires_at'] - 60):
+            refreshed = working_images.get_working_image(image_id, user_id=1)
+        self.assertGreater(refreshed['expires_at'], entry['expires_at'])
+
+    def test_prunes_orphaned_files(self):
+        """Test image files left behind by culled entries are removed after the TTL."""
+        image_id, _ = working_images.create_working_image(encode(make_test_image(0.01)), user_id=1)
+        working_images.get_store().clear()
+        path = os.path.join(working_images.get_data_dir(), image_id)
+        os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+        working_images.create_working_image(encode(make_test_image(0.01)), user_id=1)
+
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(working_images.read_working_image_data(image_id))
+
+    def test_disk_use_is_capped(self):
+        """Test the least recently used photos are removed once the files pass the size cap."""
+        data = encode(make_test_image(0.01))
+        with self.settings(EFFECT_WORKING_IMAGE_MAX_BYTES=2 * len(data)):
+            first, _ = working_images.create_working_image(data, user_id=1)
+            os.utime(os.path.join(working_images.get_data_dir(), first), (time.time() - 60, time.time() - 60))
+            second, _ = working_images.create_working_image(data, user_id=1)
+            third, _ = working_images.create_working_image(data, user_id=1)
+
+        self.assertIsNone(working_images.get_working_image(first, user_id=1))
+        self.assertIsNone(working_images.read_working_image_data(first))
+        for image_id in [second, third]:
+            self.assertEqual(working_images.read_working_image_data(image_id), data)
+        self.assertEqual(len(os.listdir(working_images.get_data_dir())), 2)
+
+    def test_newer_requests_supersede_older_ones(self):
+        """Test only the newest numbered request for an image carries on."""
+        image_id, _ = working_images.create_working_image(encode(make_test_image(0.01)), user_id=1)
+        self.assertTrue(working_images.start_request(image_id, 1))
+        working_images.check_superseded(image_id, 1)
+
+        self.assertTrue(working_images.start_request(image_id, 3))
+        with self.assertRaises(working_images.RequestSuperseded):
+            working_images.check_superseded(image_id, 1)
+        # A late arrival of an older request is turned away at the start
+        self.assertFalse(working_images.start_request(image_id, 2))
+
+    @override_settings(EFFECT_MAX_PIXELS=1000)
+    def test_rejects_invalid_uploads(self):
+        """Test oversized and non-image uploads are never stored."""
+        with self.assertRaises(ImageTooLargeError):
+            working_images.create_working_image(encode(make_test_image(0.01)), user_id=1)
+        with self.assertRaises(UnidentifiedImageError):
+            working_images.create_working_image(b'not an image', user_id=1)
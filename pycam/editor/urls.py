@@ -7,11 +7,23 @@ from allauth.socialaccount.providers.github.views import oauth2_login as github_
 urlpatterns = [
     path('', views.login, name='login_page'),
     path('home/', views.homepage, name='home'),
+    path('working-images/', views.upload_working_image, name='upload_working_image'),
+    path('working-images/<str:image_id>/', views.delete_working_image, name='delete_working_image'),
     path('apply-effect/', views.apply_image_effect, name='apply_effect'),
+    path('effect-previews/', views.effect_previews, name='effect_previews'),
     path('save/', views.save_image, name='save_image'),
+    path('jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('jobs/<uuid:job_id>/result/', views.job_result, name='job_result'),
+    path('delete/bulk/', views.bulk_delete_images, name='bulk_delete_images'),
     path('delete/<int:image_id>/', views.delete_image, name='delete_image'),
+    path('images/<int:image_id>/renditions/<int:width>.<str:format>', views.image_rendition,
+         name='image_rendition'),
     path('share/<int:image_id>/', views.share_image, name='share_image'),
     path('api/overview', views.api_overview, name='api_overview'),
+    path('api/gallery/', views.gallery_images, name='gallery_images'),
+    path('api/cache-stats/', views.effect_cache_stats, name='effect_cache_stats'),
+    path('api/effect-pool-stats/', views.effect_pool_stats, name='effect_pool_stats'),
+    path('api/db-pool-stats/', views.database_pool_stats, name='database_pool_stats'),
 
     # Direct social login URLs
     path('accounts/google/login/', google_login_view, name='google_login'),
@@ -1,21 +1,45 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.core.files.base import ContentFile
+from django.http import HttpResponse, JsonResponse
+from django.db import connection, transaction
 from django.views.decorators.http import require_POST
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from PIL import UnidentifiedImageError
+from django.conf import settings
+from pycam.db_pool import get_pool_stats
 import base64
 import io
-from PIL import Image
+import json
 import logging
 import time
-from .models import ImageEdit
+from .models import ImageEdit, EffectJob, delete_image_edits
 from .forms import ImageEditForm
-from .effects import apply_effect
+from . import gallery, jobs, pool, render_tokens, rendering, renditions, result_cache, working_images
+from .previews import render_previews, get_thumbnail_edge
+from .decode import decode_image, read_header, ImageTooLargeError
+from .effects import (
+    apply_effect, apply_pipeline, parse_step, resolve_params,
+    EffectParameterError, EFFECT_PARAMETERS, EFFECTS
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+WORKING_IMAGE_EXPIRED = 'The photo has expired from the editor, please upload it again'
+
+
+def get_effect_params(data, effect_name):
+    """Collect validated effect parameters from request data.
+
+    Parameters can be sent by name (e.g. factor=1.2) or through the
+    editor's 0-100 'intensity' slider; explicit names win.
+    """
+    explicit = {name: data[name] for name in EFFECT_PARAMETERS.get(effect_name, {}) if name in data}
+    return resolve_params(effect_name, explicit, data.get('intensity'))
+
 
 def login(request):
     """Simple login page that redirects authenticated users"""
@@ -29,16 +53,89 @@ def homepage(request):
     if not request.user.is_authenticated:
         return redirect('login_page')
 
-    # Get user's images for the gallery
-    images = ImageEdit.objects.filter(user=request.user).order_by('-created_at')
+    # Get the first page of the user's gallery, the rest loads on scroll
+    images, next_cursor = gallery.get_gallery_page(request.user)
     form = ImageEditForm()
 
     return render(request, 'homepage.html', {
         'images': images,
+        'next_cursor': next_cursor,
         'form': form,
+        # Saves go through the background worker when one is deployed
+        'effect_jobs_enabled': getattr(settings, 'EFFECT_JOBS_ENABLED', False),
+    })
+
+
+@login_required
+def gallery_images(request):
+    """Return a page of the user's gallery, newest first.
+
+    Pass the next_cursor of one page as ?cursor= to get the next one. Each
+    page also comes as rendered gallery cards for the homepage.
+    """
+    try:
+        limit = int(request.GET.get('limit', 0)) or None
+        images, next_cursor = gallery.get_gallery_page(request.user, request.GET.get('cursor'), limit)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor or limit'})
+
+    return JsonResponse({
+        'status': 'success',
+        'images': [{
+            'id': image.id,
+            'effect': image.effect_applied,
+            'created_at': image.created_at.isoformat(),
+            'url': image.edited_image.url,
+            'thumbnail_url': image.thumbnail_url,
+            'webp_srcset': image.webp_srcset,
+            'jpeg_srcset': image.jpeg_srcset,
+        } for image in images],
+        'next_cursor': next_cursor,
+        'html': ''.join(render_to_string('partials/gallery_item.html', {'image': image}, request)
+                        for image in images),
     })
 
 
+@transaction.non_atomic_requests
+@login_required
+@require_POST
+def upload_working_image(request):
+    """Keep an uploaded photo on the server and return its ID for later edits"""
+    if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request'})
+
+    try:
+        upload = read_image_upload(request)
+        if upload is None:
+            return JsonResponse({'status': 'error', 'message': 'Missing image file'})
+
+        filename = request.FILES['image'].name if 'image' in request.FILES else ''
+        image_id, entry = working_images.create_working_image(upload[0], request.user.id, filename)
+    except ImageTooLargeError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)})
+    except UnidentifiedImageError:
+        return JsonResponse({'status': 'error', 'message': 'Unsupported image file'})
+
+    logger.info(f"Stored working image {image_id} ({entry['width']}x{entry['height']})")
+    return JsonResponse({
+        'status': 'success',
+        'image_id': image_id,
+        'expires_in': working_images.get_ttl(),
+        'width': entry['width'],
+        'height': entry['height'],
+    })
+
+
+@login_required
+def delete_working_image(request, image_id):
+    """Drop a working image the editor no longer needs"""
+    if request.method != 'DELETE':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request'})
+    deleted = working_images.delete_working_image(image_id, request.user.id)
+    return JsonResponse({'status': 'success' if deleted else 'error'})
+
+
+@transaction.non_atomic_requests
 @login_required
 @require_POST
 def apply_image_effect(request):
@@ -53,48 +150,350 @@ def apply_image_effect(request):
 
     try:
         # Get request data
-        effect_name = request.POST.get('effect')
-        image_data = request.POST.get('image')
-
-        if not effect_name or not image_data:
+        fields = get_request_fields(request)
+        effect_name = fields.get('effect')
+        image_data = fields.get('image')
+        # ID from /working-images/, so the photo isn't uploaded on every click
+        image_id = fields.get('image_id')
+        # The photo as a file or a raw image/* body, without base64
+        upload = read_image_upload(request)
+
+        # Optional chain of effects as JSON, e.g.
+        # [{"effect": "warm"}, {"effect": "contrast", "factor": 1.2}, "blur"]
+        pipeline = fields.get('pipeline')
+        steps = json.loads(pipeline) if pipeline else None
+        if steps:
+            steps = [(name, resolve_params(name, params)) for name, params in map(parse_step, steps)]
+            if not effect_name:
+                effect_name = '+'.join(name for name, _ in steps)
+
+        if not effect_name or not (image_data or image_id or upload):
             return JsonResponse({'status': 'error', 'message': 'Missing effect or image data'})
 
-        # Extract image data from base64
-        # note the image data is long and has a ;base64, at the end, so we need to split it
-        format, imgstr = image_data.split(';base64,')
-        # Get the file extension
-        ext = format.split('/')[-1]  # this is the file extention needed "e.g - jpg, png, etc."
+        params = {} if steps else get_effect_params(fields, effect_name)
+
+        if image_id:
+            working_image = working_images.get_working_image(image_id, request.user.id)
+            if working_image is None:
+                return JsonResponse({'status': 'error', 'message': WORKING_IMAGE_EXPIRED})
+            ext = working_image['format']
+            digest = working_image['digest']
+        elif upload:
+            img_data, ext = upload
+            digest = result_cache.image_digest(img_data)
+        else:
+            # Extract image data from base64
+            img_data, ext = read_data_url(image_data)
+            digest = result_cache.image_digest(img_data)
+
+        # The editor numbers its requests for each working image. When a
+        # newer one arrives (the slider moved again) older renders give up at
+        # their next checkpoint instead of finishing work nobody will see
+        seq = fields.get('seq')
+        if image_id and seq is not None:
+            seq = int(seq)
+            if not working_images.start_request(image_id, seq):
+                return superseded_response(seq)
+
+        def checkpoint():
+            if image_id and seq is not None:
+                working_images.check_superseded(image_id, seq)
+
+        # Previews are rendered on a proxy no bigger than the editor can show;
+        # the full resolution is only rendered when the image is saved.
+        # Send preview=0 to get a full-resolution result, or draft=1 for a
+        # smaller, cheaper proxy while the slider is being dragged.
+        preview = fields.get('preview', '1') != '0'
+        if not preview:
+            max_edge = None
+        elif fields.get('draft') == '1':
+            max_edge = getattr(settings, 'EFFECT_DRAFT_MAX_EDGE', 480)
+        else:
+            max_edge = getattr(settings, 'EFFECT_PREVIEW_MAX_EDGE', 1280)
+
+        # Same photo, effect and settings as an earlier request - skip the
+        # decode, render and encode entirely
+        cache_key = result_cache.make_key(digest, effect_name, steps or params, max_edge=max_edge, format=ext)
+
+        def token_for(result):
+            # Points save_image at this render. Only renders that weren't
+            # made on a downsized proxy can be saved as they are
+            full_size = max_edge is None or max(result['width'], result['height']) <= max_edge
+            # The source digest ties the render to the photo it was made
+            # from, so it can't be saved as the edit of another one
+            return render_tokens.make_render_token(
+                request.user.id, cache_key, effect_name, params, full_size, source=digest)
+
+        result = result_cache.get_result(cache_key)
+        if result is not None:
+            logger.info(f"Serving cached {effect_name} result")
+            return effect_response(request, result, effect_name, params, preview, cached=True,
+                                   render_token=token_for(result))
+
         # Decode the image data
-        img_data = base64.b64decode(imgstr)  # this is the image data in bytes
-        # Open the image
-        # this is the image object, reason is python can manage the image data in
-        # bytes and manipulate it
-        img = Image.open(io.BytesIO(img_data))
+        if image_id:
+            # Only read now: cache hits above never need the photo itself
+            img_data = working_images.read_working_image_data(image_id)
+            if img_data is None:
+                return JsonResponse({'status': 'error', 'message': WORKING_IMAGE_EXPIRED})
+
+        # Job mode: a background worker renders it and the client polls
+        # /jobs/<id>/, so slow effects don't hold up this web worker
+        if fields.get('async') == '1':
+            job = jobs.enqueue_apply(request.user, img_data, ext, effect_name, params, steps, max_edge)
+            return job_queued_response(job)
+
+        release_db_connection()
+
+        if pool.offload_enabled():
+            # Split worker mode: decode, render and encode in the effect pool
+            # so this thread only waits and the CPU work stays on its cores
+            logger.info(f"Processing {effect_name} effect in the effect pool")
+            result = pool.run(rendering.render, img_data, ext, effect_name, params, steps, max_edge)
+            checkpoint()
+        else:
+            # Decode the image into an upright RGB working image
+            # this is the image object, reason is python can manage the image data in
+            # bytes and manipulate it
+            img = decode_image(img_data, max_edge=max_edge)
+            checkpoint()
+
+            # Log basic info - helps me debug
+            logger.info(f"Processing {effect_name} effect on {img.size} image")
+
+            # Process image with selected effect, or the whole chain in one pass
+            if steps:
+                processed_image = apply_pipeline(img, steps, checkpoint=checkpoint)
+            else:
+                processed_image = apply_effect(img, effect_name, **params)
+            checkpoint()
+
+            # Encode the processed image
+            image_data = io.BytesIO()
+            processed_image.save(image_data, format=ext.upper())
+
+            result = {
+                'data': image_data.getvalue(),
+                'format': ext,
+                'width': processed_image.width,
+                'height': processed_image.height,
+            }
+        result_cache.set_result(cache_key, result)
+
+        return effect_response(request, result, effect_name, params, preview, cached=False,
+                               render_token=token_for(result))
+
+    except working_images.RequestSuperseded:
+        logger.info(f"Dropped superseded {effect_name} request {seq}")
+        return superseded_response(seq)
+    except (EffectParameterError, ImageTooLargeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)})
+    except Exception as e:
+        logger.error(f"Error applying effect: {str(e)}")
+        return JsonResponse({'status': 'error', 'message': f'Error: {str(e)}'})
+
+
+def release_db_connection():
+    """Give a pooled database connection back before CPU-bound image work.
+
+    The image views run without a request transaction (non_atomic_requests),
+    so once the session and user are loaded nothing needs the connection
+    while an image is decoded and rendered. The next query checks one out
+    again. Persistent, unpooled connections are kept.
+    """
+    if getattr(connection, 'pool', None) is not None and not connection.in_atomic_block:
+        connection.close()
+
+
+def superseded_response(seq):
+    """Tell the client a newer request made this one pointless"""
+    return JsonResponse({'status': 'superseded', 'seq': seq}, status=409)
+
+
+def job_queued_response(job):
+    """Tell the client where to poll for a job it has just queued"""
+    return JsonResponse({
+        'status': 'queued',
+        'job_id': str(job.id),
+        'status_url': reverse('job_status', args=[job.id]),
+    }, status=202)
+
+
+@login_required
+def job_status(request, job_id):
+    """Report the status and progress of a queued effect job"""
+    job = get_object_or_404(EffectJob.objects.defer('input_data', 'result_data'), id=job_id, user=request.user)
+
+    data = {
+        'status': job.status,
+        'progress': job.progress,
+        'kind': job.kind,
+        'effect': job.effect,
+    }
+    if job.status == EffectJob.STATUS_FAILED:
+        data['message'] = job.error
+    elif job.status == EffectJob.STATUS_DONE:
+        if job.kind == EffectJob.KIND_APPLY:
+            data['result_url'] = reverse('job_result', args=[job.id])
+            data['width'] = job.result_width
+            data['height'] = job.result_height
+        else:
+            data['image_id'] = job.image_edit_id
+    return JsonResponse(data)
+
+
+@login_required
+def job_result(request, job_id):
+    """Return the image rendered by a finished apply-effect job"""
+    job = get_object_or_404(EffectJob, id=job_id, user=request.user, kind=EffectJob.KIND_APPLY)
+    if job.status != EffectJob.STATUS_DONE:
+        return JsonResponse({'status': 'error', 'message': f'Job is {job.status}'})
+
+    result = {
+        'data': bytes(job.result_data),
+        'format': job.input_format,
+        'width': job.result_width,
+        'height': job.result_height,
+    }
+    return effect_response(request, result, job.effect, job.params, job.max_edge is not None, cached=False)
+
+
+def get_request_fields(request):
+    """Return the request's parameters.
+
+    Images sent as a raw image/* body carry their parameters in the query
+    string; every other request sends them as form fields.
+    """
+    return request.GET if request.content_type.startswith('image/') else request.POST
+
+
+def read_image_upload(request):
+    """Return (bytes, extension) of an image sent without base64, or None.
+
+    The image can be a multipart file field named 'image' or the raw request
+    body with an image/* content type.
+    """
+    if 'image' in request.FILES:
+        data = request.FILES['image'].read()
+    elif request.content_type.startswith('image/'):
+        data = request.body
+    else:
+        return None
+    return data, image_format(data)
+
+
+def read_data_url(image_data):
+    """Return (bytes, extension) of an image sent as a base64 data URL."""
+    # note the image data is long and has a ;base64, at the end, so we need to split it
+    imgstr = image_data.split(';base64,')[1]
+    data = base64.b64decode(imgstr)  # this is the image data in bytes
+    return data, image_format(data)
+
+
+def image_format(data):
+    """Return the extension, also the Pillow format, to encode an image in.
+
+    It comes from the image bytes: clients send "application/octet-stream"
+    or "image/jpg", which Pillow has no writer for.
+    """
+    return working_images.OUTPUT_FORMATS.get(read_header(data).format, 'png')
+
+
+def wants_binary(request):
+    """Check whether the client asked for the image itself rather than JSON."""
+    return 'image/' in request.headers.get('Accept', '')
+
+
+def effect_response(request, result, effect_name, params, preview, cached, render_token=None):
+    """Return a rendered effect as raw image bytes or as JSON with a data URL.
+
+    In binary mode the effect metadata travels in X-Effect-* headers. The
+    render token lets save_image reuse this render, see render_tokens.
+    """
+    if wants_binary(request):
+        response = HttpResponse(result['data'], content_type=f"image/{result['format']}")
+        response['X-Effect'] = effect_name
+        response['X-Effect-Params'] = json.dumps(params)
+        response['X-Effect-Preview'] = '1' if preview else '0'
+        response['X-Effect-Cache'] = 'HIT' if cached else 'MISS'
+        response['X-Image-Width'] = result['width']
+        response['X-Image-Height'] = result['height']
+        if render_token:
+            response['X-Render-Token'] = render_token
+        return response
+
+    img_str = base64.b64encode(result['data']).decode('utf-8')
+    return JsonResponse({
+        'status': 'success',
+        'image': f"data:image/{result['format']};base64,{img_str}",
+        'effect': effect_name,
+        'params': params,
+        'preview': preview,
+        'cached': cached,
+        'width': result['width'],
+        'height': result['height'],
+        'render_token': render_token,
+    })
 
-        # Log basic info - helps me debug
-        logger.info(f"Processing {effect_name} effect on {img.size} image")
 
-        # Process image with selected effect
-        processed_image = apply_effect(img, effect_name)
-        if processed_image.mode != 'RGB':
-            processed_image = processed_image.convert('RGB')
+@transaction.non_atomic_requests
+@login_required
+@require_POST
+def effect_previews(request):
+    """Render a thumbnail of every effect from one upload for the effects grid"""
+    if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+        return JsonResponse({'status': 'error', 'message': 'Invalid request'})
 
-        # Return processed image as base64
-        image_data = io.BytesIO()
-        processed_image.save(image_data, format=ext.upper())
-        img_str = base64.b64encode(image_data.getvalue()).decode('utf-8')
+    try:
+        image_data = request.POST.get('image')
+        image_id = request.POST.get('image_id')
+        if image_id:
+            working_image = working_images.get_working_image(image_id, request.user.id)
+            img_data = working_image and working_images.read_working_image_data(image_id)
+            if img_data is None:
+                return JsonResponse({'status': 'error', 'message': WORKING_IMAGE_EXPIRED})
+        elif image_data and ';base64,' in image_data:
+            img_data = base64.b64decode(image_data.split(';base64,')[1])
+        else:
+            return JsonResponse({'status': 'error', 'message': 'Missing image data'})
+
+        # Optional comma separated list, defaults to every effect
+        effects = request.POST.get('effects')
+        effect_names = effects.split(',') if effects else list(EFFECTS)
+        unknown = [name for name in effect_names if name not in EFFECTS]
+        if unknown:
+            return JsonResponse({'status': 'error', 'message': f"Unknown effects: {', '.join(unknown)}"})
+
+        # The slider position applies to every effect that has a strength
+        intensity = request.POST.get('intensity')
+        params = {name: resolve_params(name, intensity=intensity) for name in effect_names}
+
+        release_db_connection()
+
+        # Decode once, straight to thumbnail size, and share it between effects
+        img = decode_image(img_data, max_edge=get_thumbnail_edge())
+        logger.info(f"Rendering {len(effect_names)} effect previews on {img.size} thumbnail")
+
+        previews = render_previews(img, effect_names, params)
 
         return JsonResponse({
             'status': 'success',
-            'image': f'data:image/{ext};base64,{img_str}',
-            'effect': effect_name
+            'previews': {
+                name: f"data:image/jpeg;base64,{base64.b64encode(data).decode('utf-8')}"
+                for name, data in previews.items()
+            },
+            'width': img.width,
+            'height': img.height,
         })
 
+    except (EffectParameterError, ImageTooLargeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)})
     except Exception as e:
-        logger.error(f"Error applying effect: {str(e)}")
+        logger.error(f"Error rendering effect previews: {str(e)}")
         return JsonResponse({'status': 'error', 'message': f'Error: {str(e)}'})
 
 
+@transaction.non_atomic_requests
 @login_required
 @require_POST
 def save_image(request):
@@ -109,40 +508,56 @@ def save_image(request):
         if 'original_image' in request.FILES:  # this is a check to see if the request has an original image
             form = ImageEditForm(request.POST, request.FILES)
             if form.is_valid():
-                # Create and save the image edit
-                image_edit = form.save(commit=False)
-                image_edit.user = request.user
                 effect_applied = request.POST.get('effect_applied', '')
-                image_edit.effect_applied = effect_applied
+                original_file = request.FILES['original_image']
+                original_file.seek(0)
+                original_data = original_file.read()
 
                 # Process with effect if one was selected
                 if effect_applied and effect_applied != 'original':
-                    # get the original image
-                    original_img = Image.open(request.FILES['original_image'])
-                    # apply the effect
-                    processed_img = apply_effect(original_img, effect_applied)
-
-                    # Save both original and processed images
-                    image_edit.save()
-
-                    # Save processed image to edited_image field
-                    img_data = io.BytesIO()
-                    # get the format of the image
-                    img_format = 'JPEG' if request.FILES['original_image'].name.lower().endswith(
-                        '.jpg') else 'PNG'
-                    # save the image
-                    processed_img.save(img_data, format=img_format)
+                    # the parameters the user previewed
+                    params = get_effect_params(request.POST, effect_applied)
+                    # reuse the render the user previewed when it is still cached
+                    rendered = render_tokens.load_render_result(
+                        request.POST.get('render_token', ''), request.user.id, effect_applied, params,
+                        source=result_cache.image_digest(original_data))
+
+                    if rendered is not None:
+                        logger.info(f"Saving previewed {effect_applied} render")
+                        edited_data = rendered['data']
+                        img_format = rendered['format'].upper()
+                    else:
+                        release_db_connection()
+                        # get the format of the image
+                        img_format = 'JPEG' if original_file.name.lower().endswith(
+                            '.jpg') else 'PNG'
+                        if pool.offload_enabled():
+                            edited_data = pool.run(
+                                rendering.render, original_data, img_format, effect_applied, params)['data']
+                        else:
+                            # get the original image as an upright RGB working image
+                            original_img = decode_image(original_data)
+                            # apply the effect with the parameters the user previewed
+                            processed_img = apply_effect(original_img, effect_applied, **params)
+
+                            # Encode the processed image
+                            img_data = io.BytesIO()
+                            # save the image
+                            processed_img.save(img_data, format=img_format)
+                            edited_data = img_data.getvalue()
 
                     timestamp = int(time.time())
                     # get the filename
                     filename = (f"edited_{request.user.id}_{effect_applied}_"
                                 f"{timestamp}.{img_format.lower()}")
-                    # save the image
-                    image_edit.edited_image.save(filename, ContentFile(img_data.getvalue()))
                 else:
                     # No effect - just use original
-                    image_edit.edited_image = image_edit.original_image
-                    image_edit.save()
+                    edited_data = original_data
+                    filename = original_file.name
+
+                # Save both original and processed images, and commit the row
+                rendering.store_edit(request.user, effect_applied, original_file.name, original_data,
+                                     filename, edited_data)
 
                 messages.success(request, 'Image saved successfully!')
                 return JsonResponse({'success': True}) if is_ajax else redirect('home')
@@ -154,38 +569,72 @@ def save_image(request):
                 messages.error(request, 'Error saving image. Please try again.')
                 return redirect('home')
 
-        # Handle AJAX image data
-        elif is_ajax:
+        # Handle a photo kept on the server while it was being edited
+        elif is_ajax and request.POST.get('image_id'):
+            working_image = working_images.get_working_image(request.POST['image_id'], request.user.id)
+            original_data = working_image and working_images.read_working_image_data(request.POST['image_id'])
+            if original_data is None:
+                return JsonResponse({'success': False, 'error': WORKING_IMAGE_EXPIRED})
+
             effect = request.POST.get('effect_applied', '')
-            image_data = request.POST.get('image')
+            params = get_effect_params(request.POST, effect) if effect else {}
 
-            if not image_data:
-                return JsonResponse({'success': False, 'error': 'No image data provided'})
+            # Reuse the render the user previewed when it is still cached
+            rendered = render_tokens.load_render_result(
+                request.POST.get('render_token', ''), request.user.id, effect, params,
+                source=working_image['digest'])
+            edited_data = rendered['data'] if rendered is not None else None
 
-            # Check image format and extract data
-            if ';base64,' not in image_data:
-                return JsonResponse({'success': False, 'error': 'Invalid image data format'})
+            # Job mode: render and save in a background worker
+            if edited_data is None and request.POST.get('async') == '1':
+                job = jobs.enqueue_save(
+                    request.user, original_data, working_image['format'], effect, params)
+                return job_queued_response(job)
 
-            format, imgstr = image_data.split(';base64,')
-            ext = format.split('/')[-1]
-            img_data = base64.b64decode(imgstr)
+            # Render the effect at full resolution from the original upload
+            if edited_data is None:
+                release_db_connection()
+            image_edit = rendering.save_edit(
+                request.user, original_data, working_image['format'], effect, params,
+                edited_data=edited_data)
+
+            logger.info(f"Working image saved with ID: {image_edit.id}")
+
+            return JsonResponse({
+                'success': True,
+                'message': 'Image saved successfully',
+                'image_id': image_edit.id
+            })
+
+        # Handle AJAX image data
+        elif is_ajax:
+            fields = get_request_fields(request)
+            effect = fields.get('effect_applied', '')
+            image_data = fields.get('image')
+            # The edited image as a file or a raw image/* body, without base64
+            upload = read_image_upload(request)
+
+            if upload:
+                img_data, ext = upload
+            else:
+                if not image_data:
+                    return JsonResponse({'success': False, 'error': 'No image data provided'})
+
+                # Check image format and extract data
+                if ';base64,' not in image_data:
+                    return JsonResponse({'success': False, 'error': 'Invalid image data format'})
+
+                img_data, ext = read_data_url(image_data)
 
             # Create unique identifier for this image
             timestamp = int(time.time())
             unique_id = f"{request.user.id}_{timestamp}"
 
-            # Create and save ImageEdit object
-            image_edit = ImageEdit(
-                user=request.user,
-                effect_applied=effect
-            )
-
-            # Save both original and edited versions
-            image_edit.original_image.save(f"original_{unique_id}.{ext}", ContentFile(img_data))
-            image_edit.edited_image.save(
-                f"edited_{unique_id}_{effect}.{ext}",
-                ContentFile(img_data))
-            image_edit.save()
+            # Save both original and edited versions, and commit the row
+            image_edit = rendering.store_edit(
+                request.user, effect,
+                f"original_{unique_id}.{ext}", img_data,
+                f"edited_{unique_id}_{effect}.{ext}", img_data)
 
             logger.info(f"AJAX image saved with ID: {image_edit.id}")
 
@@ -231,6 +680,39 @@ def delete_image(request, image_id):
     return redirect('home')
 
 
+@login_required
+@require_POST
+def bulk_delete_images(request):
+    """Delete several images from the user's gallery at once.
+
+    Send the image IDs as repeated `ids` fields. The rows go in one query and
+    their files are removed in the background afterwards.
+    """
+    if request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+        return JsonResponse({'success': False, 'error': 'Invalid request'})
+
+    try:
+        image_ids = [int(image_id) for image_id in request.POST.getlist('ids')]
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid image IDs'})
+    if not image_ids:
+        return JsonResponse({'success': False, 'error': 'No images selected'})
+
+    # Other users' IDs are silently skipped
+    deleted = delete_image_edits(ImageEdit.objects.filter(user=request.user, id__in=image_ids))
+    logger.info(f"Bulk deleted {deleted} images")
+    return JsonResponse({'success': True, 'deleted': deleted})
+
+
+@login_required
+def image_rendition(request, image_id, width, format):
+    """Redirect to a gallery rendition of an image, generating them on first use"""
+    image = get_object_or_404(ImageEdit, id=image_id, user=request.user)
+    rendition = renditions.find_rendition(image, width, format)
+    # Images that can't be resized are shown as they are
+    return redirect(rendition.file.url if rendition else image.edited_image.url)
+
+
 @login_required
 def share_image(request, image_id):
     """Get a shareable link for the specified image"""
@@ -245,12 +727,40 @@ def share_image(request, image_id):
     return redirect(image.edited_image.url)
 
 
+@staff_member_required
+def effect_cache_stats(request):
+    """Hit/miss counters for the effect result cache - staff only"""
+    return JsonResponse(result_cache.get_stats())
+
+
+@staff_member_required
+def effect_pool_stats(request):
+    """Queue depth of the effect process pool of the worker serving the request - staff only"""
+    return JsonResponse(pool.get_stats())
+
+
+@staff_member_required
+def database_pool_stats(request):
+    """Connection pool counters of the worker serving the request - staff only"""
+    return JsonResponse(get_pool_stats())
+
+
 def api_overview(request):
     """API documentation endpoint - lists available API endpoints"""
     api_urls = {
+        'Gallery': '/api/gallery/',
+        'Upload Working Image': '/working-images/',
         'Apply Effect': '/apply-effect/',
+        'Effect Previews': '/effect-previews/',
         'Save Image': '/save/',
+        'Job Status': '/jobs/<job_id>/',
+        'Job Result': '/jobs/<job_id>/result/',
         'Delete Image': '/delete/<image_id>/',
+        'Bulk Delete Images': '/delete/bulk/',
+        'Image Rendition': '/images/<image_id>/renditions/<width>.<format>',
         'Share Image': '/share/<image_id>/',
+        'Effect Cache Stats': '/api/cache-stats/',
+        'Effect Pool Stats': '/api/effect-pool-stats/',
+        'Database Pool Stats': '/api/db-pool-stats/',
     }
     return JsonResponse(api_urls)
@@ -0,0 +1,211 @@
+"""
+Uploaded photos kept on the server while they are being edited
+"""
+import hashlib
+import os
+import secrets
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .decode import read_header
+
+KEY_PREFIX = 'working-image'
+SEQUENCE_PREFIX = 'working-image-seq'
+
+# Encoded format of each working image, by the format Pillow reports.
+# Anything else is kept as PNG so no quality is lost.
+OUTPUT_FORMATS = {
+    'JPEG': 'jpeg',
+    'MPO': 'jpeg',  # phone cameras write JPEGs with extra frames
+    'PNG': 'png',
+    'WEBP': 'webp',
+}
+
+
+def get_store():
+    """Return the cache that holds working image entries (EFFECT_WORKING_IMAGE_ALIAS)."""
+    return caches[getattr(settings, 'EFFECT_WORKING_IMAGE_ALIAS', 'working_images')]
+
+
+def get_data_dir():
+    """Directory of the working images' bytes (EFFECT_WORKING_IMAGE_DIR).
+
+    It must be shared by every web worker on the host, like the store.
+    """
+    return getattr(settings, 'EFFECT_WORKING_IMAGE_DIR',
+                   os.path.join(tempfile.gettempdir(), 'pycam_working_images', 'data'))
+
+
+def get_ttl():
+    """Seconds a working image lives after it was last used (EFFECT_WORKING_IMAGE_TTL)."""
+    return getattr(settings, 'EFFECT_WORKING_IMAGE_TTL', 30 * 60)
+
+
+def get_max_bytes():
+    """Bytes all working images may take on disk together (EFFECT_WORKING_IMAGE_MAX_BYTES).
+
+    Past it, the least recently used photos are removed to make room.
+    """
+    return getattr(settings, 'EFFECT_WORKING_IMAGE_MAX_BYTES', 1024 * 1024 * 1024)
+
+
+def create_working_image(data, user_id, filename=''):
+    """Store an uploaded photo and return its ID and entry.
+
+    The upload is kept as the original encoded bytes, so every effect and
+    the final save start from the same full-quality source. The bytes are
+    written to a file as they are; the store only holds the small entry
+    describing them, so looking an image up doesn't read the photo.
+
+    Raises:
+        ImageTooLargeError: If the image is over the pixel budget
+        PIL.UnidentifiedImageError: If the bytes are not a supported image
+    """
+    img = read_header(data)
+    entry = {
+        'user_id': user_id,
+        'format': OUTPUT_FORMATS.get(img.format, 'png'),
+        'filename': filename,
+        'digest': hashlib.sha256(data).hexdigest(),
+        'width': img.width,
+        'height': img.height,
+        'expires_at': time.time() + get_ttl(),
+    }
+    image_id = secrets.token_urlsafe(16)
+
+    _prune_data(len(data))
+    os.makedirs(get_data_dir(), exist_ok=True)
+    # Write then rename, so other workers never read a partial file
+    path = _data_path(image_id)
+    with open(f'{path}.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(f'{path}.tmp', path)
+
+    get_store().set(_key(image_id), entry, timeout=get_ttl())
+    return image_id, entry
+
+
+def get_working_image(image_id, user_id):
+    """Return a user's working image entry, or None if it has expired.
+
+    The entry has the image's format, digest and size; read the bytes with
+    read_working_image_data. Using an image extends its lifetime, but the
+    entry is only rewritten once half of it has passed.
+    """
+    store = get_store()
+    entry = store.get(_key(image_id))
+    # IDs are unguessable, but never hand one user's photo to another
+    if entry is None or entry['user_id'] != user_id:
+        return None
+
+    ttl = get_ttl()
+    if entry['expires_at'] - time.time() < ttl / 2:
+        entry['expires_at'] = time.time() + ttl
+        store.set(_key(image_id), entry, timeout=ttl)
+        try:
+            os.utime(_data_path(image_id))
+        except FileNotFoundError:
+            return None
+    return entry
+
+
+def read_working_image_data(image_id):
+    """Return the encoded bytes of a working image, or None if they are gone."""
+    try:
+        with open(_data_path(image_id), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def delete_working_image(image_id, user_id):
+    """Remove a user's working image, returning whether it existed."""
+    if get_working_image(image_id, user_id) is None:
+        return False
+    try:
+        os.remove(_data_path(image_id))
+    except FileNotFoundError:
+        pass
+    return get_store().delete(_key(image_id))
+
+
+def _prune_data(incoming=0):
+    """Make room for `incoming` bytes in the image directory.
+
+    Files that haven't been used for longer than the TTL are removed; their
+    entries have expired, or were culled by the store (FileBasedCache culls
+    a random share of its entries once MAX_ENTRIES is reached). Then the
+    least recently used photos go until everything fits in get_max_bytes().
+    """
+    cutoff = time.time() - get_ttl()
+    try:
+        entries = list(os.scandir(get_data_dir()))
+    except FileNotFoundError:
+        return
+
+    files = []
+    for entry in entries:
+        try:
+            stat = entry.stat()
+            if stat.st_mtime < cutoff:
+                os.remove(entry.path)
+            # Files still being written by another worker are left alone
+            elif not entry.name.endswith('.tmp'):
+                files.append((stat.st_mtime, stat.st_size, entry))
+        except FileNotFoundError:
+            pass
+
+    total = incoming + sum(size for _, size, _ in files)
+    for _, size, entry in sorted(files, key=lambda file: file[0]):
+        if total <= get_max_bytes():
+            break
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        get_store().delete(_key(entry.name))
+
+
+class RequestSuperseded(Exception):
+    """Raised when a newer request for the same working image has started."""
+
+
+def start_request(image_id, seq):
+    """Record `seq` as the newest request for a working image.
+
+    The editor numbers its requests for each photo, e.g. while the
+    intensity slider is dragged. Returns False if a request with a higher
+    number has already started, in which case this one is stale.
+    """
+    store = get_store()
+    latest = store.get(_sequence_key(image_id))
+    if latest is not None and latest > seq:
+        return False
+    store.set(_sequence_key(image_id), seq, timeout=get_ttl())
+    return True
+
+
+def check_superseded(image_id, seq):
+    """Raise RequestSuperseded if a newer request for the image has started."""
+    latest = get_store().get(_sequence_key(image_id))
+    if latest is not None and latest > seq:
+        raise RequestSuperseded(f'Request {seq} for {image_id} was superseded by {latest}')
+
+
+def _sequence_key(image_id):
+    return f'{SEQUENCE_PREFIX}:{image_id}'
+
+
+def _data_path(image_id):
+    # IDs come from token_urlsafe; never let one point outside the directory
+    if not image_id.replace('-', '').replace('_', '').isalnum():
+        raise ValueError(f'Invalid working image ID {image_id!r}')
+    return os.path.join(get_data_dir(), image_id)
+
+
+def _key(image_id):
+    return f'{KEY_PREFIX}:{image_id}'
@@ -1,19 +1,49 @@
 # Gunicorn configuration file for PyCam
 
 import multiprocessing
+import os
 from django.db import connections
 
+from editor.pool import physical_cores, shutdown_pool
+
 # Server socket
 bind = "0.0.0.0:8000"
 
-# Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-
-# Use sync worker type to avoid gevent threading issues
-worker_class = "sync"
-
-# Set threads to 1 to avoid threading issues entirely
-threads = 1
+# Worker model, GUNICORN_WORKER_MODE:
+#  - "sync" (default): cpu_count * 2 + 1 single-threaded workers that render
+#    effects in the request
+#  - "split": a few threaded (or async) workers handle requests and hand
+#    effect rendering to a fixed process pool, so slow renders don't hold up
+#    the gallery, sharing and deleting
+worker_mode = os.environ.get('GUNICORN_WORKER_MODE', 'sync').lower()
+
+if worker_mode == 'split':
+    # Request handling is mostly waiting on the database, storage and the
+    # effect pool, so threads are enough
+    workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    threads = int(os.environ.get('THREADS_PER_WORKER', 8))
+
+    os.environ.setdefault('EFFECT_POOL_OFFLOAD', 'true')
+    # Every thread may hold a database connection
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(threads))
+else:
+    # Worker processes
+    workers = multiprocessing.cpu_count() * 2 + 1
+
+    # Use sync worker type to avoid gevent threading issues
+    worker_class = "sync"
+
+    # Set threads to 1 to avoid threading issues entirely
+    threads = 1
+
+# One effect process per physical core in total (EFFECT_POOL_SIZE), shared
+# out between the web workers: each has its own pool, pools don't survive a
+# fork. Sync mode has more workers than cores, so each gets a single process
+# and renders in one piece. Read by the Django settings, which load after
+# this file.
+effect_workers = int(os.environ.get('EFFECT_POOL_SIZE', physical_cores()))
+os.environ.setdefault('EFFECT_POOL_WORKERS', str(max(1, effect_workers // workers)))
 
 # Server mechanics
 daemon = False
@@ -50,7 +80,8 @@ worker_connections = 1000
 def worker_exit(server, worker):
     """Handle worker exit - clean up resources"""
     connections.close_all()
-    server.log.info("Worker exited, cleaned up connections")
+    shutdown_pool()
+    server.log.info("Worker exited, cleaned up connections and effect pool")
 
 def worker_abort(worker):
     """Handle worker abort - clean up resources"""
@@ -0,0 +1,4 @@
+"""
+Custom database backends. Use 'pycam.db_backends' as a database ENGINE for
+SQLite with retries on transient errors, see retry.py.
+"""
@@ -0,0 +1,156 @@
+"""
+SQLite database backend tuned for several web workers, retrying transient errors
+"""
+import threading
+
+from django.conf import settings
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLite3DatabaseWrapper
+from django.db.utils import OperationalError
+
+from .retry import RetryWrapper
+
+# Pragmas run on every new connection, updated with settings.SQLITE_PRAGMAS.
+# Set a pragma to None there to leave SQLite's default.
+PRAGMAS = {
+    # Readers and the writer don't block each other
+    'journal_mode': 'WAL',
+    # Milliseconds to wait for a lock before "database is locked"
+    'busy_timeout': 5000,
+    # With WAL a power cut can lose the last commits but never corrupts the database
+    'synchronous': 'NORMAL',
+    # Read the database file through a 256 MiB memory map
+    'mmap_size': 256 * 1024 * 1024,
+    # Page cache of each connection, negative values are KiB: 64 MiB
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+}
+
+# Statements that take SQLite's write lock
+WRITE_STATEMENTS = frozenset(['INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER'])
+
+_write_locks = {}
+_write_locks_lock = threading.Lock()
+
+
+def get_pragmas():
+    """Return the pragmas to set, PRAGMAS updated with settings.SQLITE_PRAGMAS."""
+    pragmas = {**PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def serialize_writes():
+    """Whether the threads of a process write one at a time (SQLITE_SERIALIZE_WRITES)."""
+    return getattr(settings, 'SQLITE_SERIALIZE_WRITES', False)
+
+
+def get_write_lock(name):
+    """Return the process-wide writer lock of a database file."""
+    with _write_locks_lock:
+        return _write_locks.setdefault(name, threading.Lock())
+
+
+def is_write(sql):
+    words = sql.split(None, 1)
+    return bool(words) and words[0].upper() in WRITE_STATEMENTS
+
+
+class SerializedWriter:
+    """Execute wrapper that lets one connection of the process write at a time.
+
+    SQLite only has one writer anyway. Queueing writers on a lock, held
+    until the transaction ends, spares them from spinning in SQLite's busy
+    handler. Transactions take the lock when they begin (see
+    DatabaseWrapper._start_transaction_under_autocommit), statements
+    outside a transaction when they write. Reads outside transactions never
+    wait. Other processes still queue on busy_timeout.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context['connection']
+        if connection.holds_write_lock or not is_write(sql):
+            return execute(sql, params, many, context)
+
+        connection.acquire_write_lock()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Inside a transaction the lock is kept until it commits or rolls back
+            if not connection.in_atomic_block:
+                connection.release_write_lock()
+
+
+class DatabaseWrapper(SQLite3DatabaseWrapper):
+    """
+    Database wrapper for SQLite3 that applies PRAGMAS to each connection and
+    retries queries failing with "database is locked" or a closed
+    connection, with backoff, a per-request retry budget and a circuit
+    breaker. Tune it with the SQLITE_PRAGMAS, SQLITE_SERIALIZE_WRITES and
+    DB_RETRY settings.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holds_write_lock = False
+        # Outermost wrapper, so it also retries around any wrappers added
+        # later with connection.execute_wrapper()
+        self.execute_wrappers.append(RetryWrapper())
+        if serialize_writes():
+            self.execute_wrappers.append(SerializedWriter())
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # BEGIN IMMEDIATE unless OPTIONS['transaction_mode'] says otherwise.
+        # A deferred transaction that reads and then writes can't write at all
+        # once another connection has committed since its read (WAL's
+        # SQLITE_BUSY_SNAPSHOT, retrying can't fix it). Taking the write lock
+        # at BEGIN makes such transactions wait on busy_timeout instead.
+        if self.transaction_mode is None:
+            self.transaction_mode = 'IMMEDIATE'
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        if serialize_writes() and not self.holds_write_lock:
+            self.acquire_write_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self.release_write_lock()
+            raise
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        # WAL and memory maps don't apply to in-memory databases
+        if not self.is_in_memory_db():
+            for name, value in get_pragmas().items():
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def acquire_write_lock(self):
+        """Wait up to busy_timeout for the writer lock, as SQLite would."""
+        timeout = get_pragmas().get('busy_timeout', 5000) / 1000
+        if not get_write_lock(self.settings_dict['NAME']).acquire(timeout=timeout):
+            raise OperationalError('database is locked')
+        self.holds_write_lock = True
+
+    def release_write_lock(self):
+        if self.holds_write_lock:
+            self.holds_write_lock = False
+            get_write_lock(self.settings_dict['NAME']).release()
+
+    def _commit(self):
+        try:
+            super()._commit()
+        finally:
+            self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self.release_write_lock()
@@ -0,0 +1,238 @@
+"""
+Retry policy for transient database errors: exponential backoff with jitter,
+a retry budget per request and a per-process circuit breaker
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.utils import OperationalError, InterfaceError
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the DB_RETRY setting
+DEFAULTS = {
+    # Attempts per query, the first one included
+    'MAX_ATTEMPTS': 4,
+    # Backoff before retry n is a random delay up to BASE_DELAY * 2**n seconds,
+    # capped at MAX_DELAY
+    'BASE_DELAY': 0.05,
+    'MAX_DELAY': 1.0,
+    # Retries one request may spend across all its queries, None for no limit
+    'REQUEST_BUDGET': 6,
+    # Consecutive failed queries that open the circuit breaker
+    'BREAKER_THRESHOLD': 5,
+    # Seconds the breaker stays open before one trial query is let through
+    'BREAKER_RESET': 30,
+}
+
+# Errors that a later attempt can get past
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+CLOSED_MESSAGES = ('closed database',)
+
+
+def get_policy():
+    """Return the retry settings, DEFAULTS updated with settings.DB_RETRY."""
+    return {**DEFAULTS, **getattr(settings, 'DB_RETRY', {})}
+
+
+class CircuitOpenError(OperationalError):
+    """Raised without touching the database while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated database failures.
+
+    Closed: queries run normally. After BREAKER_THRESHOLD consecutive
+    failures it opens and queries fail at once for BREAKER_RESET seconds.
+    Then it is half-open: one trial query runs, and its outcome closes or
+    reopens the breaker.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+
+    def before_call(self, policy):
+        """Raise CircuitOpenError if the query shouldn't reach the database."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= policy['BREAKER_RESET']:
+                # Let this query through as the trial
+                self.state = self.HALF_OPEN
+                return
+        counters.add('fast_failures')
+        raise CircuitOpenError('Database circuit breaker is open, not trying the database')
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Database circuit breaker closed")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self, policy):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= policy['BREAKER_THRESHOLD']:
+                if self.state != self.OPEN:
+                    logger.error(f"Database circuit breaker opened after {self.failures} failures")
+                    counters.add('breaker_opened')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class Counters:
+    """Thread-safe counters of this process's retries and breaker trips."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+counters = Counters()
+breakers = {}
+_breakers_lock = threading.Lock()
+
+# Retries left for the current request; None outside requests
+_request_budget = contextvars.ContextVar('db_retry_budget', default=None)
+
+
+def get_breaker(alias):
+    """Return the circuit breaker of a database alias."""
+    with _breakers_lock:
+        return breakers.setdefault(alias, CircuitBreaker())
+
+
+def get_stats():
+    """Return the retry counters and the state of each circuit breaker."""
+    return {
+        **counters.snapshot(),
+        'breakers': {alias: breaker.state for alias, breaker in breakers.items()},
+    }
+
+
+def reset_request_budget(**kwargs):
+    """Give a new request its retry budget (request_started receiver)."""
+    _request_budget.set(get_policy()['REQUEST_BUDGET'])
+
+
+request_started.connect(reset_request_budget, dispatch_uid='db_retry_budget')
+
+
+def _take_from_budget():
+    budget = _request_budget.get()
+    if budget is None:
+        return True
+    if budget <= 0:
+        counters.add('budget_exhausted')
+        return False
+    _request_budget.set(budget - 1)
+    return True
+
+
+def get_delay(retry, policy):
+    """Seconds to wait before retry number `retry` (0-based), with full jitter."""
+    return random.uniform(0, min(policy['MAX_DELAY'], policy['BASE_DELAY'] * 2 ** retry))
+
+
+class RetryWrapper:
+    """Execute wrapper (see connection.execute_wrappers) that retries transient errors.
+
+    Outside transactions, a locked database is retried on the same
+    connection and a closed one is reconnected. Inside one nothing is
+    retried, see _can_retry.
+    """
+
+    def __call__(self, execute, sql, params, many, context):
+        connection = context['connection']
+        policy = get_policy()
+        breaker = get_breaker(connection.alias)
+        breaker.before_call(policy)
+
+        # Every outcome is recorded, or a half-open breaker whose trial query
+        # raised would stay half-open and refuse every later query
+        try:
+            result = self._execute(execute, sql, params, many, context, connection, policy)
+        except BaseException as e:
+            if (isinstance(e, (OperationalError, InterfaceError)) and self._is_transient(e)
+                    and not self._is_contention(e, connection)):
+                breaker.record_failure(policy)
+                counters.add('failures')
+            else:
+                # The database answered, e.g. with an IntegrityError, or
+                # another writer holds the lock: ordinary contention
+                breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
+
+    def _execute(self, execute, sql, params, many, context, connection, policy):
+        attempt = 0
+        while True:
+            try:
+                result = execute(sql, params, many, context)
+            except (OperationalError, InterfaceError) as e:
+                if not self._can_retry(e, connection, attempt, policy):
+                    raise
+
+                delay = get_delay(attempt, policy)
+                attempt += 1
+                counters.add('retries')
+                logger.warning(
+                    f"Database operation failed (attempt {attempt}/{policy['MAX_ATTEMPTS']}): {e}. "
+                    f"Retrying in {delay:.3f} seconds..."
+                )
+                time.sleep(delay)
+                if self._is_closed(e):
+                    self._reconnect(connection, context)
+                continue
+
+            if attempt:
+                counters.add('recovered')
+            return result
+
+    def _can_retry(self, error, connection, attempt, policy):
+        if attempt + 1 >= policy['MAX_ATTEMPTS']:
+            return False
+        # Inside a transaction neither can succeed: a reconnect would drop the
+        # transaction's earlier statements, and a locked statement keeps its
+        # stale snapshot. The request or atomic block has to fail or start over
+        if connection.in_atomic_block or not self._is_transient(error):
+            return False
+        return _take_from_budget()
+
+    def _is_contention(self, error, connection):
+        """Whether the error is a lock held by another writer within a transaction."""
+        return connection.in_atomic_block and not self._is_closed(error)
+
+    def _is_transient(self, error):
+        message = str(error)
+        return any(text in message for text in LOCKED_MESSAGES + CLOSED_MESSAGES) or isinstance(error, InterfaceError)
+
+    def _is_closed(self, error):
+        return isinstance(error, InterfaceError) or any(text in str(error) for text in CLOSED_MESSAGES)
+
+    def _reconnect(self, connection, context):
+        connection.close()
+        connection.connect()
+        # The failed cursor belongs to the old connection
+        context['cursor'].cursor = connection.create_cursor()
@@ -0,0 +1,58 @@
+"""
+Connection pool metrics for each database
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+from .db_backends import retry
+
+logger = logging.getLogger(__name__)
+
+
+def warn_if_unpooled():
+    """Log a warning for each PostgreSQL database left without the pool that DB_POOL asked for.
+
+    The pool needs psycopg 3 with psycopg_pool; without them settings.py
+    quietly falls back to persistent connections.
+    """
+    if not getattr(settings, 'DB_POOL_REQUESTED', False):
+        return
+    for alias, database in settings.DATABASES.items():
+        if database['ENGINE'] == 'django.db.backends.postgresql' and 'pool' not in database.get('OPTIONS', {}):
+            logger.warning(
+                f"Database {alias} isn't pooled: psycopg_pool isn't installed, "
+                f"install psycopg[binary,pool] or set DB_POOL=false"
+            )
+
+
+def get_pool_stats():
+    """Return connection stats of this process for each database.
+
+    Pooled databases report psycopg_pool's counters plus the average time a
+    request waited for a connection. Databases on the pycam.db_backends
+    engine add their retry counters. The counters are per worker process.
+    """
+    stats = {}
+    for connection in connections.all():
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            stats[connection.alias] = {
+                'pooled': False,
+                'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+            }
+            if connection.settings_dict['ENGINE'] == 'pycam.db_backends':
+                stats[connection.alias]['retries'] = retry.get_stats()
+            continue
+
+        pool_stats = pool.get_stats()
+        requests = pool_stats.get('requests_num', 0)
+        wait_ms = pool_stats.get('requests_wait_ms', 0)
+        stats[connection.alias] = {
+            'pooled': True,
+            **pool_stats,
+            'avg_wait_ms': wait_ms / requests if requests else 0,
+        }
+    return stats
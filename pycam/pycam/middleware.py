@@ -1,26 +1,53 @@
-from django.db import close_old_connections
-from django.db.utils import OperationalError, ProgrammingError, InterfaceError
+from django.conf import settings
 import logging
+import time
 
+from .db_pool import get_pool_stats, warn_if_unpooled
 
-class DatabaseConnectionMiddleware:
+logger = logging.getLogger(__name__)
+
+
+class DatabasePoolMetricsMiddleware:
     """
-    Middleware that manages database connections to prevent
-    "Cannot operate on a closed database" errors.
+    Middleware that logs database connection pool metrics every
+    DB_POOL_METRICS_INTERVAL seconds: pool size, checkouts and how long
+    requests waited for a connection since the last report.
+
+    Django itself returns connections to the pool (or keeps persistent ones)
+    at the end of each request, so nothing is closed here.
     """
 
     def __init__(self, get_response):
         self.get_response = get_response
-        self.logger = logging.getLogger(__name__)
+        self.last_report = time.monotonic()
+        self.last_stats = {}
+        # Runs once as each worker loads the app
+        warn_if_unpooled()
 
     def __call__(self, request):
-        # Close any stale connections at the start of the request
-        close_old_connections()
-
-        # Process the request
         response = self.get_response(request)
 
-        # Close all connections at the end of the request
-        close_old_connections()
+        now = time.monotonic()
+        if now - self.last_report >= getattr(settings, 'DB_POOL_METRICS_INTERVAL', 60):
+            self.last_report = now
+            self.report()
 
         return response
+
+    def report(self):
+        """Log the pool counters since the previous report"""
+        for alias, stats in get_pool_stats().items():
+            if not stats['pooled']:
+                continue
+            previous = self.last_stats.get(alias, {})
+            self.last_stats[alias] = stats
+
+            checkouts = stats.get('requests_num', 0) - previous.get('requests_num', 0)
+            wait_ms = stats.get('requests_wait_ms', 0) - previous.get('requests_wait_ms', 0)
+            logger.info(
+                f"DB pool {alias}: size={stats.get('pool_size', 0)} "
+                f"available={stats.get('pool_available', 0)} waiting={stats.get('requests_waiting', 0)} "
+                f"checkouts={checkouts} wait_ms={wait_ms} "
+                f"avg_wait_ms={wait_ms / checkouts if checkouts else 0:.1f} "
+                f"timeouts={stats.get('requests_errors', 0) - previous.get('requests_errors', 0)}"
+            )
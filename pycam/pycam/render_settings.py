@@ -16,11 +16,6 @@ ALLOWED_HOSTS = ['*']
 # Database connection settings - no need to redefine database config
 # since it's already handled in settings.py via DATABASE_URL
 
-# Add database connection middleware
-MIDDLEWARE = MIDDLEWARE + [
-    'pycam.middleware.DatabaseConnectionMiddleware',
-]
-
 # Enable async views
 INSTALLED_APPS += ['uvicorn']
 
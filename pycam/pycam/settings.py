@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import dj_database_url
+import importlib.util
 import os
+import tempfile
 from pathlib import Path
 
 # Try to import dotenv, but handle case when it's not installed
@@ -80,6 +82,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # Add the account middleware:
     'allauth.account.middleware.AccountMiddleware',
+    # Logs connection pool wait times, see DB_POOL_METRICS_INTERVAL
+    'pycam.middleware.DatabasePoolMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'pycam.urls'
@@ -132,7 +136,9 @@ elif USE_SQLITE:
     # Use SQLite for local development when DJANGO_DATABASE=sqlite and not in Docker
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
+            # SQLite in WAL mode with retries on "database is locked", see
+            # SQLITE_PRAGMAS and DB_RETRY
+            'ENGINE': 'pycam.db_backends',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
         }
     }
@@ -149,10 +155,97 @@ else:
         }
     }
 
+# Connection reuse. With psycopg 3 and psycopg_pool installed, each worker
+# process keeps a bounded pool of PostgreSQL connections: requests check one
+# out and give it back when they finish, connections are health-checked on
+# checkout, replaced after DB_POOL_MAX_LIFETIME seconds and closed after
+# DB_POOL_MAX_IDLE idle seconds. Otherwise each thread keeps a persistent,
+# health-checked connection for DB_CONN_MAX_AGE seconds.
+# Without psycopg_pool a warning is logged at startup, see db_pool.py.
+DB_POOL_REQUESTED = os.environ.get('DB_POOL', 'true').lower() == 'true'
+DB_POOL_ENABLED = DB_POOL_REQUESTED and importlib.util.find_spec('psycopg_pool') is not None
+
+# Retries of transient database errors in the pycam.db_backends engine, see
+# pycam/db_backends/retry.py for the options and their defaults
+DB_RETRY = {
+    'MAX_ATTEMPTS': int(os.environ.get('DB_RETRY_MAX_ATTEMPTS', 4)),
+    'REQUEST_BUDGET': int(os.environ.get('DB_RETRY_REQUEST_BUDGET', 6)),
+    'BREAKER_THRESHOLD': int(os.environ.get('DB_RETRY_BREAKER_THRESHOLD', 5)),
+    'BREAKER_RESET': float(os.environ.get('DB_RETRY_BREAKER_RESET', 30)),
+}
+
+# Pragmas of the pycam.db_backends SQLite engine, on top of its defaults in
+# pycam/db_backends/base.py (WAL, synchronous=NORMAL, 256 MiB mmap, ...)
+SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+}
+
+# Queue the writes of each worker process's threads on one lock instead of
+# letting them race for SQLite's write lock. Reads are never serialized.
+SQLITE_SERIALIZE_WRITES = os.environ.get('SQLITE_SERIALIZE_WRITES', 'false').lower() == 'true'
+
+# Seconds between connection pool metric log lines
+DB_POOL_METRICS_INTERVAL = int(os.environ.get('DB_POOL_METRICS_INTERVAL', 60))
+
 # Always apply these database settings
 for db_name in DATABASES:
     DATABASES[db_name]['ATOMIC_REQUESTS'] = True
-    DATABASES[db_name]['CONN_MAX_AGE'] = 0  # Always close connections
+    DATABASES[db_name]['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL_ENABLED and DATABASES[db_name]['ENGINE'] == 'django.db.backends.postgresql':
+        # Closing a pooled connection returns it to the pool
+        DATABASES[db_name]['CONN_MAX_AGE'] = 0
+        DATABASES[db_name].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 4)),
+            # Seconds a request waits for a free connection before failing
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 30 * 60)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 5 * 60)),
+        }
+    else:
+        DATABASES[db_name]['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 10 * 60))
+
+# Photos sent as raw image/* bodies or base64 form fields count against this
+# limit (multipart files don't), so allow a full-size camera image
+DATA_UPLOAD_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
+# Effect process pool of each web worker: EFFECT_POOL_WORKERS processes, by
+# default one per physical core. With EFFECT_POOL_OFFLOAD the image views
+# render in the pool instead of the request thread; gunicorn_config.py's
+# split worker mode sets both.
+EFFECT_POOL_WORKERS = int(os.environ.get('EFFECT_POOL_WORKERS', 0)) or None
+EFFECT_POOL_OFFLOAD = os.environ.get('EFFECT_POOL_OFFLOAD', 'false').lower() == 'true'
+
+# Set when `manage.py run_effect_worker` processes are running, so the
+# editor hands full-size saves to them instead of rendering in the request
+EFFECT_JOBS_ENABLED = os.environ.get('EFFECT_JOBS_ENABLED', 'false').lower() == 'true'
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Photos being edited are kept on disk so every gunicorn worker on the host
+# can reach them: a small entry per photo in a file cache, and the photo's
+# bytes as a plain file next to it. The cache culls a random third of its
+# entries once MAX_ENTRIES is hit; orphaned photo files are pruned after
+# EFFECT_WORKING_IMAGE_TTL.
+WORKING_IMAGE_DIR = os.environ.get('WORKING_IMAGE_DIR', os.path.join(tempfile.gettempdir(), 'pycam_working_images'))
+EFFECT_WORKING_IMAGE_DIR = os.path.join(WORKING_IMAGE_DIR, 'data')
+# Disk space all photos being edited may take together; the least recently
+# used ones are removed beyond it
+EFFECT_WORKING_IMAGE_MAX_BYTES = int(os.environ.get('WORKING_IMAGE_MAX_MB', 1024)) * 1024 * 1024
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'working_images': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(WORKING_IMAGE_DIR, 'entries'),
+        'TIMEOUT': 30 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100,
+        },
+    },
+}
 
 
 # Password validation
@@ -3,6 +3,17 @@
  * Contains all the specific functionality for the photo editing application
  */
 
+// ID of the photo kept on the server while it's edited, from /working-images/
+let workingImageId = null;
+
+// Apply-effect requests are numbered so the server can drop superseded ones,
+// and the one in flight can be aborted when a newer one starts
+let effectSequence = 0;
+let effectRequest = null;
+
+// Points the server at the render on screen, so saving can reuse it
+let renderToken = null;
+
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize the photo editor features
     initializePhotoEditor();
@@ -58,7 +69,14 @@ function initializePhotoEditor() {
     // Intensity slider
     if (intensitySlider) {
         intensitySlider.addEventListener('input', function() {
-            // Only apply if we have an image and an effect selected
+            // Only apply if we have an image and an effect selected. While
+            // dragging, render cheap drafts on a small proxy
+            if (currentImage && currentEffect) {
+                applyEffect(currentEffect, this.value, true);
+            }
+        });
+        intensitySlider.addEventListener('change', function() {
+            // The final position gets the full preview
             if (currentImage && currentEffect) {
                 applyEffect(currentEffect, this.value);
             }
@@ -91,7 +109,7 @@ function initializePhotoEditor() {
     }
 
     // Helper function to apply an effect to the image
-    function applyEffect(effect, intensity = 50) {
+    function applyEffect(effect, intensity = 50, draft = false) {
         // In a real implementation, this would call an AJAX endpoint
         // Here we'll simulate by showing a loading indicator
 
@@ -104,32 +122,78 @@ function initializePhotoEditor() {
         const formData = new FormData();
         formData.append('effect', effect);
         formData.append('intensity', intensity);
+        formData.append('seq', ++effectSequence);
+        renderToken = null;
+        if (draft) {
+            formData.append('draft', '1');
+        }
 
-        // Get the image data URL from the canvas
-        const canvas = document.createElement('canvas');
-        canvas.width = currentImage.naturalWidth;
-        canvas.height = currentImage.naturalHeight;
-        const ctx = canvas.getContext('2d');
-        ctx.drawImage(currentImage, 0, 0);
-        const imageData = canvas.toDataURL('image/jpeg', 0.9);
-
-        formData.append('image', imageData);
+        // Stop waiting for the previous result, nobody will see it
+        if (effectRequest) {
+            effectRequest.abort();
+        }
+        effectRequest = new AbortController();
+        const signal = effectRequest.signal;
+
+        if (workingImageId) {
+            // The server already has the original upload
+            formData.append('image_id', workingImageId);
+            sendEffectRequest(formData, loadingIndicator, signal);
+        } else {
+            // Send the canvas as a binary file. Always start from the
+            // original so slider moves don't stack the effect on itself
+            const sourceImage = originalImage || currentImage;
+            const canvas = document.createElement('canvas');
+            canvas.width = sourceImage.naturalWidth;
+            canvas.height = sourceImage.naturalHeight;
+            const ctx = canvas.getContext('2d');
+            ctx.drawImage(sourceImage, 0, 0);
+            canvas.toBlob(blob => {
+                // A newer request may have started while encoding
+                if (!signal.aborted) {
+                    formData.append('image', blob, 'image.jpg');
+                    sendEffectRequest(formData, loadingIndicator, signal);
+                }
+            }, 'image/jpeg', 0.9);
+        }
+    }
 
-        // Send request to the server
+    // Helper function to send an effect request and show the result
+    function sendEffectRequest(formData, loadingIndicator, signal) {
+        // Send request to the server, asking for the result as raw image
+        // bytes rather than a base64 data URL inside JSON
         fetch('/apply-effect/', {
             method: 'POST',
             headers: {
                 'X-Requested-With': 'XMLHttpRequest',
-                'X-CSRFToken': getCsrfToken()
+                'X-CSRFToken': getCsrfToken(),
+                'Accept': 'image/*'
             },
-            body: formData
+            body: formData,
+            signal: signal
+        })
+        .then(response => {
+            // Results come back as an image, errors always as JSON
+            const contentType = response.headers.get('Content-Type') || '';
+            if (contentType.startsWith('image/')) {
+                return response.blob().then(blob => ({
+                    status: 'success',
+                    image: URL.createObjectURL(blob),
+                    render_token: response.headers.get('X-Render-Token')
+                }));
+            }
+            return response.json();
         })
-        .then(response => response.json())
         .then(data => {
             if (data.status === 'success') {
+                renderToken = data.render_token || null;
                 // Load the processed image
                 const newImage = new Image();
                 newImage.onload = function() {
+                    // Release the previous result
+                    if (currentImage && currentImage.src.startsWith('blob:')) {
+                        URL.revokeObjectURL(currentImage.src);
+                    }
                     currentImage = newImage;
                     displayImage(currentImage);
 
@@ -138,6 +202,9 @@ function initializePhotoEditor() {
                     }
                 };
                 newImage.src = data.image;
+            } else if (data.status === 'superseded') {
+                // A newer request replaced this one; its response will follow
+                return;
             } else {
                 console.error('Error applying effect:', data.message);
                 if (loadingIndicator) {
@@ -149,6 +216,10 @@ function initializePhotoEditor() {
             }
         })
         .catch(error => {
+            // Aborted because a newer request started
+            if (error.name === 'AbortError') {
+                return;
+            }
             console.error('Error:', error);
             if (loadingIndicator) {
                 loadingIndicator.style.display = 'none';
@@ -294,6 +365,9 @@ function setupPhotoUpload() {
                 return;
             }
 
+            // A render of the previous photo can't be saved for this one
+            renderToken = null;
+
             // Display preview
             const reader = new FileReader();
             reader.onload = function(e) {
@@ -318,6 +392,9 @@ function setupPhotoUpload() {
             };
             reader.readAsDataURL(file);
 
+            // Upload the photo once; effects and saving then refer to it by ID
+            uploadWorkingImage(file);
+
             // Enable the editor section
             const editorSection = document.querySelector('.editor-section');
             if (editorSection) {
@@ -371,12 +448,26 @@ function setupPhotoUpload() {
 
     // Function to save the edited image
     function saveEditedImage() {
-        const canvas = editorCanvas;
-        const imageData = canvas.toDataURL('image/jpeg', 0.9);
-
         const formData = new FormData(uploadForm);
-        formData.append('image', imageData);
+        if (workingImageId) {
+            // Rendered on the server from the original upload at full size
+            formData.delete('original_image');
+            formData.append('image_id', workingImageId);
+        } else {
+            const canvas = editorCanvas;
+            formData.append('image', canvas.toDataURL('image/jpeg', 0.9));
+        }
         formData.append('effect_applied', currentEffect);
+        if (renderToken) {
+            // Save the render on screen instead of computing it again
+            formData.append('render_token', renderToken);
+        }
+
+        // Render the saved image with the same intensity as the preview
+        const intensitySlider = document.getElementById('intensity-slider');
+        if (intensitySlider) {
+            formData.append('intensity', intensitySlider.value);
+        }
 
         fetch('/save/', {
             method: 'POST',
@@ -405,6 +496,35 @@ function setupPhotoUpload() {
     }
 }
 
+/**
+ * Upload a photo to the server once and remember its working image ID
+ */
+function uploadWorkingImage(file) {
+    workingImageId = null;
+
+    const formData = new FormData();
+    formData.append('image', file);
+
+    return fetch('/working-images/', {
+        method: 'POST',
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+            'X-CSRFToken': getCsrfToken()
+        },
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.status === 'success') {
+            workingImageId = data.image_id;
+        } else {
+            // Effects fall back to sending the canvas contents
+            console.error('Error uploading image:', data.message);
+        }
+    })
+    .catch(error => console.error('Error uploading image:', error));
+}
+
 /**
  * Helper function to display notifications
  */